@@ -62,9 +62,18 @@ def main(argv=None):
            render:    (string) Specifies the names of the columns that must be rendered, separated by comma
         """))
 
+    argParser.add_argument(
+        '--cache-size', type=int, default=512, help=textwrap.dedent("""
+        Memory (in Mb) used to cache images, shared by all the views.
+        Default: 512
+        """))
+
     args = argParser.parse_args(argv)
     app = qtw.QApplication([])
 
+    # All the views share the same ImageManager
+    emv.utils.ImageManager.setDefault(maxCacheSize=args.cache_size)
+
     # ARGS
     path = args.path or os.getcwd()
     print("argv: ", argv)
@@ -152,6 +161,8 @@ def main(argv=None):
     if os.path.isdir(path):
         kwargs['rootPath'] = path
         kwargs['mode'] = dv.widgets.TreeModelView.DIR_MODE
+        # Big micrographs are binned in the preview
+        kwargs['maxPreviewSize'] = 2048
 
         viewWidget = emv.views.EmBrowser(**kwargs)
 
@@ -174,7 +185,7 @@ def main(argv=None):
     elif emv.utils.EmPath.isData(path):
         print("Data case")
         # *.mrc may be image, stack or volume. Ask for dim.n
-        d = emv.utils.ImageManager().getDim(path)
+        d = emv.utils.ImageManager.getDefault().getDim(path)
         x, y, z, n = d
         if n == 1:  # Single image or volume
             if z == 1:  # Single image
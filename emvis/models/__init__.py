@@ -1,5 +1,5 @@
 
-from ._emtable_model import (EmTableModel, EmStackModel, EmVolumeModel,
-                             EmListModel)
+from ._emtable_model import (EmTableModel, EmPagedTableModel, EmStackModel,
+                             EmVolumeModel, EmListModel)
 from ._empicker import EmPickerModel
 from ._models_factory import ModelsFactory
\ No newline at end of file
@@ -12,7 +12,7 @@ class EmPickerModel(dv.models.PickerModel):
 
     def __init__(self, imageManager=None):
         dv.models.PickerModel.__init__(self)
-        self._imageManager = imageManager or ImageManager()
+        self._imageManager = imageManager or ImageManager.getDefault()
         self._cache = {}
 
     def getData(self, micId):
@@ -29,7 +29,8 @@ class EmPickerModel(dv.models.PickerModel):
             mic = self.getMicrograph(micId)
             from scipy.ndimage import gaussian_filter
             import numpy as np
-            data = self._imageManager.getData(mic.getPath())
+            # Request a copy, since the data is filtered in place
+            data = self._imageManager.getData(mic.getPath(), copy=True)
             gaussian_filter(data, sigma=2, output=data)
             mean = np.mean(data)
             std = 5 * np.std(data)
@@ -39,6 +40,19 @@ class EmPickerModel(dv.models.PickerModel):
 
         return data
 
+    def getRegion(self, micId, x, y, w, h, binning=1):
+        """
+        Return a region of the micrograph image data, without loading
+        the whole micrograph (see ImageManager.getRegion).
+        :param micId: (int) The micrograph id
+        :param x, y, w, h: (int) The region (in micrograph pixels)
+        :param binning: (int) The binning factor of the returned data
+        :return: The region image data
+        """
+        mic = self.getMicrograph(micId)
+        return self._imageManager.getRegion(mic.getPath(), x, y, w, h,
+                                            binning=binning)
+
     def getImageInfo(self, micId):
         """
         Return some specified info from the given image path.
@@ -1,12 +1,21 @@
 
 import os
+import itertools
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
 import datavis as dv
 from datavis.utils import py23
 import emcore as emc
 
-from ..utils import EmType, EmPath, ImageManager, ImageRef
+from ..utils import (EmType, EmPath, ImageManager, ImageRef, ImageRefIndex,
+                     StarFile, RowFilter)
+
+# Maximum number of bytes of the loaded items kept by EmTableModel in
+# asynchronous mode (images are also kept in the cache of the ImageManager)
+ASYNC_DATA_SIZE = 64 * 1024 * 1024
 
 
 class EmTableModel(dv.models.TableModel):
@@ -29,7 +38,21 @@ class EmTableModel(dv.models.TableModel):
 
         Keyword Arguments:
             imageManager=value Provide an ImageManager that can be used
-                to read images referenced from this table.
+                to read images referenced from this table. If not provided,
+                the default one is used (see ImageManager.getDefault).
+            thumbnailSize=value If provided, getData will return thumbnails
+                of the images (see ImageManager.getThumbnail) with this size
+                instead of the full images.
+            asyncData=bool If True, getData will not wait for the images to
+                be read (see getDataAsync). Default False.
+            dataReadyCallback=value Function called as callback(row, col)
+                when an image loaded asynchronously is ready.
+            placeholder=value Value returned by getData while the image
+                is being loaded in asynchronous mode. Default None.
+            columnar=bool If True, getValue will read the values from
+                numpy arrays with the whole columns (see getColumnData),
+                built the first time each column is accessed.
+                Default False.
         """
         if isinstance(tableSource, emc.Table):
             self._table = tableSource
@@ -57,12 +80,44 @@ class EmTableModel(dv.models.TableModel):
             # If not tableName provided, load first table
             tableName = tableName or self._tableNames[0]
 
-        # Create an ImageManager if none is provided
-        self._imageManager = kwargs.get('imageManager', ImageManager())
+        self._setup(**kwargs)
+        self.loadTable(tableName)
+
+    def _setup(self, **kwargs):
+        """ Initialize the attributes used to access the columns and read
+        the images referenced from the table (see the keyword arguments of
+        __init__).
+        """
+        self._columnar = kwargs.get('columnar', False)
+        # Arrays of the columns already read (see _getColumnData)
+        self._columnData = dict()
+        # Table row of each row of the model after sorting or filtering
+        self._rowMap = None
+
+        # Use the default ImageManager if none is provided
+        self._imageManager = (kwargs.get('imageManager') or
+                              ImageManager.getDefault())
         # Use a dictionary for checking the prefix path of the
         # images columns data
         self._imagePrefixes = kwargs.get('imagePrefixes', {})
-        self.loadTable(tableName)
+        self._thumbnailSize = kwargs.get('thumbnailSize')
+        # ImageRefIndex of each image column, built when first needed
+        self._imageRefIndexes = dict()
+        # Groups of rows by file of each image column (see getImageGroups)
+        self._imageGroups = dict()
+
+        # Asynchronous loading: futures of the pending (row, col) items and
+        # the most recently loaded ones
+        self._asyncData = kwargs.get('asyncData', False)
+        self._dataReadyCallback = kwargs.get('dataReadyCallback')
+        self._placeholder = kwargs.get('placeholder')
+        self._pendingData = dict()
+        self._readyData = OrderedDict()
+        self._readySize = 0
+        self._asyncLock = threading.Lock()
+        # Increasing priorities, so the last requested items (the ones
+        # visible now) are loaded first
+        self._asyncSeq = itertools.count()
 
     def __del__(self):
         if self._tableIO is not None:
@@ -73,12 +128,19 @@ class EmTableModel(dv.models.TableModel):
         # Map between the order and the columns Id
         self._colsMap = {i: c.getId()
                          for i, c in enumerate(self._table.iterColumns())}
+        self._colsTypes = {i: c.getType()
+                           for i, c in enumerate(self._table.iterColumns())}
 
     def _loadTable(self, tableName):
         # Only really load table if we have created the emc.TableFile
         if self._tableIO is not None:
             self._tableIO.read(tableName, self._table)
         self.__updateColsMap()
+        self._columnData = dict()
+        self._rowMap = None
+        self._imageRefIndexes = dict()
+        self._imageGroups = dict()
+        self.cancelData()
 
     def iterColumns(self):
         for c in self._table.iterColumns():
@@ -90,30 +152,580 @@ class EmTableModel(dv.models.TableModel):
 
     def getRowsCount(self):
         """ Return the number of rows. """
+        if self._rowMap is not None:
+            return len(self._rowMap)
         return self._table.getSize()
 
     def getValue(self, row, col):
         """ Return the value of the item in this row, column. """
+        row = self.getTableRow(row)
+        if self._columnar:
+            return self._getColumnValue(row, col)
         return self._table[row][self._colsMap[col]]
 
+    def getColumnData(self, col):
+        """ Return a numpy array with all the values of column col. Numeric
+        columns use the equivalent numpy type and other columns are
+        returned as arrays of str objects. Values are in the order of the
+        table rows, even if the rows of the model are sorted or filtered.
+        """
+        data = self._getColumnData(col)
+        if isinstance(data, tuple):
+            categories, codes = data
+            return categories[codes]
+        return data
+
+    def getColumnCategories(self, col):
+        """ Return the (categories, codes) arrays of a string column.
+        categories contains the distinct values (in order of appearance) and
+        codes the position of the value of each row in categories.
+        """
+        data = self._getColumnData(col)
+        if not isinstance(data, tuple):
+            raise Exception("Column %d is not a string column" % col)
+        return data
+
+    def _getColumnData(self, col):
+        """ Return the array of a numeric column, or the (categories, codes)
+        arrays of other columns. They are read only once, and kept until
+        another table is loaded.
+        """
+        data = self._columnData.get(col, None)
+        if data is None:
+            values = self._readColumn(col)
+            if not isinstance(values, np.ndarray) or values.dtype.kind == 'S':
+                values = self._getCategories(values)
+            data = self._columnData[col] = values
+        return data
+
+    @classmethod
+    def _getCategories(cls, values):
+        """ Return the (categories, codes) arrays of the given strings,
+        either a list of str or a numpy array of bytes. Each distinct string
+        is stored only once, in order of appearance.
+        """
+        if isinstance(values, np.ndarray):
+            unique, first, codes = np.unique(values, return_index=True,
+                                             return_inverse=True)
+            order = np.argsort(first)
+            ranks = np.empty(len(unique), dtype=np.int32)
+            ranks[order] = np.arange(len(unique), dtype=np.int32)
+            categories = np.empty(len(unique), dtype=object)
+            categories[:] = np.char.decode(unique[order], 'utf-8').tolist()
+            return categories, ranks[codes.ravel()]
+
+        ids = dict()
+        codes = np.fromiter((ids.setdefault(v, len(ids)) for v in values),
+                            dtype=np.int32, count=len(values))
+        categories = np.empty(len(ids), dtype=object)
+        categories[:] = list(ids.keys())
+        return categories, codes
+
+    def _getColumnValue(self, row, col):
+        """ Return the value of this row, column from the column arrays. """
+        data = self._getColumnData(col)
+        if isinstance(data, tuple):
+            return data[0][data[1][row]]
+        return data[row].item()
+
+    def _readColumn(self, col):
+        """ Read all the values of column col. Return a numpy array for
+        numeric columns or a list of strings (or a numpy array of bytes)
+        for other ones.
+        """
+        colId = self._colsMap[col]
+        dtype = EmType.toNumpy(self._colsTypes[col])
+        if dtype is None:
+            return [str(row[colId]) for row in self._table]
+        conv = float if np.dtype(dtype).kind == 'f' else int
+        return np.fromiter((conv(row[colId]) for row in self._table),
+                           dtype=dtype, count=self._table.getSize())
+
+    def sortRows(self, col, reverse=False):
+        """ Sort the rows of the model by the values of column col. The
+        sort is stable, so sorting by several columns is possible, starting
+        with the least significant one. The table is not modified, only the
+        order of the rows returned by the model changes (see getTableRow).
+
+        Args:
+            col: The column used to sort.
+            reverse: If True, rows are sorted in descending order.
+        """
+        keys = self._getSortKeys(col)
+        rows = (np.arange(len(keys)) if self._rowMap is None
+                else self._rowMap)
+        keys = keys[rows]
+        if reverse:
+            # Stable descending order: ties keep their previous order
+            order = np.argsort(keys[::-1], kind='stable')[::-1]
+            order = len(keys) - 1 - order
+        else:
+            order = np.argsort(keys, kind='stable')
+        self._setRowMap(rows[order])
+
+    def filterRows(self, expression):
+        """ Keep only the rows (of the current ones) where the expression is
+        true (see RowFilter), e.g. 'rlnClassNumber == 3 and rlnDefocusU >
+        20000'. Columns are referenced by their names.
+        Return the number of rows after filtering.
+        """
+        if not isinstance(expression, RowFilter):
+            expression = RowFilter(expression)
+        colIndexes = {c.getName(): i for i, c in enumerate(self.iterColumns())}
+
+        def _getColumn(name):
+            if name not in colIndexes:
+                raise Exception("Unknown column '%s' in filter expression: %s"
+                                % (name, expression.getExpression()))
+            return self._getColumnData(colIndexes[name])
+
+        mask = expression.evaluate(_getColumn)
+        if mask.ndim == 0:  # Constant expression
+            mask = np.full(self._getTableSize(), bool(mask))
+        rows = np.flatnonzero(mask) if self._rowMap is None else (
+            self._rowMap[mask[self._rowMap]])
+        self._setRowMap(rows)
+        return len(rows)
+
+    def resetRows(self):
+        """ Restore the rows of the table, without sorting or filtering. """
+        self._setRowMap(None)
+
+    def getTableRow(self, row):
+        """ Return the row of the table that is shown in the given row of
+        the model (they are different after sorting or filtering).
+        """
+        return row if self._rowMap is None else int(self._rowMap[row])
+
+    def getTableRows(self, rows):
+        """ Return the array with the table row of each row of the model. """
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows if self._rowMap is None else self._rowMap[rows]
+
+    def _setRowMap(self, rowMap):
+        """ Set the table row of each row of the model. Asynchronous loads
+        are cancelled, since their rows are not valid anymore.
+        """
+        self._rowMap = rowMap
+        self._imageGroups = dict()
+        self.cancelData()
+
+    def _getSortKeys(self, col):
+        """ Return the array used to sort by column col. Strings are sorted
+        by the position of their categories in sorted order.
+        """
+        data = self._getColumnData(col)
+        if not isinstance(data, tuple):
+            return data
+        categories, codes = data
+        ranks = np.empty(len(categories), dtype=np.int32)
+        ranks[np.argsort(categories, kind='stable')] = np.arange(
+            len(categories), dtype=np.int32)
+        return ranks[codes]
+
+    def _getTableSize(self):
+        """ Return the number of rows of the table. """
+        return self._table.getSize()
+
+    def getImageRefIndex(self, col):
+        """ Return the ImageRefIndex with the image references of all the
+        rows in column col. It is built the first time it is requested.
+        Rows in the index are the rows of the table (see getTableRow).
+        """
+        index = self._imageRefIndexes.get(col, None)
+        if index is None:
+            values = self._getColumnStrings(col)
+            imgPrefix = self._getImagePrefix(col, values[0] if values
+                                             else None)
+            index = ImageRefIndex(values, imgPrefix)
+            self._imageRefIndexes[col] = index
+        return index
+
+    def _getImagePrefix(self, col, value):
+        """ Return the prefix of the image paths of column col, searched
+        from the given value the first time it is requested.
+        """
+        if col not in self._imagePrefixes:
+            self._imagePrefixes[col] = (
+                None if value is None else
+                self._imageManager.findImagePrefix(value, self._path))
+        return self._imagePrefixes[col]
+
+    def _getColumnStrings(self, col):
+        """ Return the list with the values of column col as strings. """
+        data = self._columnData.get(col, None)
+        if isinstance(data, tuple):  # Already read
+            categories, codes = data
+            return categories[codes].tolist()
+        colId = self._colsMap[col]
+        return [str(row[colId]) for row in self._table]
+
+    def getImageGroups(self, col, rows=None):
+        """ Group the rows by the file referenced from column col, so the
+        images can be read in file order, opening each file only once,
+        instead of in row order. The groups of all the rows are built the
+        first time they are requested.
+
+        Args:
+            col: The image column.
+            rows: Optional iterable with the rows to be grouped (e.g. the
+                visible or selected ones). If None, all the rows are grouped.
+
+        Returns:
+            An OrderedDict with the path of each file and the array of its
+            rows, sorted by image index.
+        """
+        index = self.getImageRefIndex(col)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            return index.groupByFile(self.getTableRows(rows), values=rows)
+
+        groups = self._imageGroups.get(col, None)
+        if groups is None:
+            if self._rowMap is None:
+                groups = index.groupByFile()
+            else:
+                groups = index.groupByFile(
+                    self._rowMap, values=np.arange(len(self._rowMap)))
+            self._imageGroups[col] = groups
+        return groups
+
+    def iterDataGroups(self, col, rows=None):
+        """ Iterate over the images of the given rows of column col, reading
+        them file by file (see getImageGroups).
+
+        Yields:
+            (rows, data) tuples, where data is the numpy array with the
+            images of the rows of each file (see getDataBatch).
+        """
+        for groupRows in self.getImageGroups(col, rows).values():
+            yield groupRows, self.getDataBatch(groupRows, col)
+
+    def _getImageRef(self, row, col):
+        """ Return the ImageRef referenced from the given row, column. """
+        return self.getImageRefIndex(col).getRef(self.getTableRow(row))
+
     def getData(self, row, col):
         """ Return the data (array like) for the item in this row, column.
          Used by rendering of images in a given cell of the table.
         """
-        value = str(self._table[row][self._colsMap[col]])
-        imgRef = self._imageManager.getRef(value)
+        if self._asyncData:
+            return self.getDataAsync(row, col)
+
+        imgRef = self._getImageRef(row, col)
+        if self._thumbnailSize:
+            return self._imageManager.getThumbnail(imgRef, self._thumbnailSize)
+        return self._imageManager.getData(imgRef)
+
+    def getThumbnail(self, row, col, maxSize=None):
+        """ Return a downsampled version of the image in this row, column
+        (see ImageManager.getThumbnail), e.g. to be rendered in a gallery
+        cell, without changing the data returned by getData. The views of
+        datavis (e.g. the gallery of DataView) read the cells with getData,
+        so they do not use it yet and still render the full images.
+
+        Args:
+            maxSize: (int) Size (in pixels) at which the thumbnail will be
+                displayed. If None, the thumbnailSize of the model is used.
+        """
+        maxSize = maxSize or self._thumbnailSize
+        if not maxSize:
+            raise Exception("No thumbnail size provided")
+        return self._imageManager.getThumbnail(self._getImageRef(row, col),
+                                               maxSize)
+
+    def getDataAsync(self, row, col):
+        """ Return the data for the item in this row, column if it has
+        already been loaded. Otherwise, the image is loaded in the pool of
+        threads of the ImageManager and the placeholder is returned. When
+        the data is ready, the dataReadyCallback is called from the loading
+        thread (e.g. Qt views should emit a signal from it, so the cell is
+        updated from the GUI thread). Items that could not be loaded are
+        also notified, and the placeholder is returned for them.
+        """
+        key = row, col
+        with self._asyncLock:
+            if key in self._readyData:
+                self._readyData.move_to_end(key)
+                data = self._readyData[key]
+                return self._placeholder if data is None else data
+            if key in self._pendingData:
+                return self._placeholder
+
+        self._requestData(key, self._getImageRef(row, col))
+        return self._placeholder
+
+    def _requestData(self, key, imgRef):
+        """ Load the image of the (row, col) key in background. """
+        future = self._imageManager.prefetch(
+            [imgRef], priority=next(self._asyncSeq),
+            thumbnailSize=self._thumbnailSize or None)[0]
+        with self._asyncLock:
+            self._pendingData[key] = future, imgRef
+        future.add_done_callback(
+            lambda f: self._onDataReady(key, f))
+
+    def _onDataReady(self, key, future):
+        """ Store the data of a finished load and notify it. """
+        with self._asyncLock:
+            item = self._pendingData.get(key, None)
+            if item is None or item[0] is not future:
+                return  # Cancelled or replaced
+            del self._pendingData[key]
+
+        if future.cancelled():
+            # Cancelled by other user of the same ImageManager task, but
+            # the item is still wanted here
+            self._requestData(key, item[1])
+            return
+
+        # Failed loads are stored as None, so they are not requested again
+        data = None if future.exception() is not None else future.result()
+        with self._asyncLock:
+            self._storeData(key, data)
+
+        if self._dataReadyCallback is not None:
+            self._dataReadyCallback(*key)
+
+    def _storeData(self, key, data):
+        """ Keep the loaded data, discarding the least recently used items
+        if ASYNC_DATA_SIZE is exceeded (the last one is always kept).
+        Should be called with the asyncLock acquired.
+        """
+        old = self._readyData.pop(key, None)
+        self._readySize -= 0 if old is None else old.nbytes
+        self._readyData[key] = data
+        self._readySize += 0 if data is None else data.nbytes
+        while self._readySize > ASYNC_DATA_SIZE and len(self._readyData) > 1:
+            _, old = self._readyData.popitem(last=False)
+            self._readySize -= 0 if old is None else old.nbytes
+
+    def setDataReadyCallback(self, callback):
+        """ Set the function called as callback(row, col) when an image
+        loaded asynchronously is ready.
+        """
+        self._dataReadyCallback = callback
+
+    def setVisibleRows(self, rows, col=None):
+        """ Cancel the pending asynchronous loads of the rows that are not
+        in the given ones (e.g. rows that scrolled out of the view).
+
+        Args:
+            rows: Iterable with the visible rows.
+            col: If provided, only the loads of this column are cancelled.
+
+        Returns:
+            The number of cancelled loads.
+        """
+        rows = set(rows)
+        with self._asyncLock:
+            keys = [k for k in self._pendingData
+                    if k[0] not in rows and (col is None or k[1] == col)]
+        return self.cancelData(keys)
 
-        if col in self._imagePrefixes:
-            imgPrefix = self._imagePrefixes[col]
+    def cancelData(self, keys=None):
+        """ Cancel pending asynchronous loads. The ImageManager tasks shared
+        with other items (or models) are not cancelled while they are still
+        requested by them (see ImageManager.cancel).
+
+        Args:
+            keys: Iterable of (row, col) items. If None, all the pending
+                loads are cancelled and the loaded items are discarded.
+
+        Returns:
+            The number of cancelled loads.
+        """
+        with self._asyncLock:
+            if keys is None:
+                keys = list(self._pendingData.keys())
+                self._readyData.clear()
+                self._readySize = 0
+            items = [self._pendingData.pop(k) for k in keys
+                     if k in self._pendingData]
+
+        refs = [imgRef for future, imgRef in items if not future.done()]
+        return self._imageManager.cancel(
+            refs, thumbnailSize=self._thumbnailSize or None) if refs else 0
+
+    def getDataBatch(self, rows, col):
+        """ Return a numpy array with the images of the given rows in
+        column col (e.g all the cells of a gallery page). The first
+        dimension of the array is the position of the row in rows.
+        """
+        return self._imageManager.getDataBatch(
+            self.getImageRefIndex(col).getRefs(self.getTableRows(rows)))
+
+    def prefetchData(self, rows, col, priority=0):
+        """ Load in background the images of the given rows in column col,
+        so further calls to getData will not need to read them from disk.
+        Images are requested in file order (see getImageGroups).
+        Returns the list of futures created by ImageManager.prefetch, in
+        the order of the rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        tableRows = self.getTableRows(rows)
+        index = self.getImageRefIndex(col)
+        # Positions of the rows in file order
+        groups = index.groupByFile(tableRows, values=np.arange(len(rows)))
+        order = (np.concatenate(list(groups.values())) if groups
+                 else np.empty(0, dtype=np.int64))
+        futures = self._imageManager.prefetch(
+            index.getRefs(tableRows[order]), priority=priority)
+
+        result = [None] * len(rows)
+        for i, future in zip(order.tolist(), futures):
+            result[i] = future
+        return result
+
+
+class EmPagedTableModel(EmTableModel):
+    """ Implementation of TableModel for big STAR files. Instead of reading
+    the whole table, the file is mapped and rows are parsed on demand, in
+    pages (see StarFile). Rows are found in a background thread, so the
+    number of rows grows until the table is loaded (see isLoaded and
+    setRowsChangedCallback).
+    In columnar mode, the columns are read when the table is loaded, so the
+    first access to each column waits for it.
+    """
+    # Model type of the column types inferred by StarTable
+    PY_TYPE_TO_MODELS = {
+        int: dv.models.TYPE_INT,
+        float: dv.models.TYPE_FLOAT,
+        str: dv.models.TYPE_STRING
+    }
+
+    def __init__(self, tableSource, **kwargs):
+        """ Create a new instance of EmPagedTableModel.
+
+        Args:
+            tableSource: Either the path of the STAR file, 'name@path' or a
+                tuple (path, name) to specify the table to be loaded.
+
+        Keyword Arguments:
+            The same ones of EmTableModel, and:
+            rowsChangedCallback=value Function called as callback(rowsCount)
+                when new rows of the table are found.
+        """
+        if isinstance(tableSource, py23.str):
+            if '@' in tableSource:
+                tableName, path = tableSource.split('@')
+            else:
+                tableName, path = None, tableSource
+        elif isinstance(tableSource, tuple):
+            path, tableName = tableSource
         else:
-            imgPrefix = self._imagePrefixes.get(
-                col, self._imageManager.findImagePrefix(value, self._path))
-            self._imagePrefixes[col] = imgPrefix
+            raise Exception("Invalid tableSource input '%s' (type %s)"
+                            % (tableSource, type(tableSource)))
+
+        self._path = os.path.abspath(path)
+        self._tableIO = None
+        self._starFile = StarFile(self._path)
+        self._starTable = None
+        self._tableNames = self._starFile.getTableNames()
+        tableName = tableName or self._tableNames[0]
+        self._rowsChangedCallback = kwargs.get('rowsChangedCallback')
+
+        self._setup(**kwargs)
+        self.loadTable(tableName)
+
+    def __del__(self):
+        self._starFile.close()
+
+    def _loadTable(self, tableName):
+        if self._starTable is not None:
+            self._starTable.setRowsCallback(None)
+        self._starTable = self._starFile.getTable(tableName)
+        self._columnData = dict()
+        self._rowMap = None
+        self._imageRefIndexes = dict()
+        self._imageGroups = dict()
+        self.cancelData()
+        self._starTable.setRowsCallback(self._onRowsChanged)
+
+    def iterColumns(self):
+        names = self._starTable.getColumnNames()
+        types = self._starTable.getColumnTypes()
+        for name, t in zip(names, types):
+            yield dv.models.ColumnInfo(name, self.PY_TYPE_TO_MODELS[t])
+
+    def getColumnsCount(self):
+        """ Return the number of columns. """
+        return len(self._starTable.getColumnNames())
 
+    def getRowsCount(self):
+        """ Return the number of rows found until now. """
+        if self._rowMap is not None:
+            return len(self._rowMap)
+        return self._starTable.getRowsCount()
+
+    def isLoaded(self):
+        """ Return True if all the rows of the table have been found. """
+        return self._starTable.isLoaded()
+
+    def setRowsChangedCallback(self, callback):
+        """ Set the function called as callback(rowsCount) when new rows
+        of the table are found. It is called from the thread that scans the
+        table (e.g. Qt views should emit a signal from it, so the view is
+        updated from the GUI thread). Rows found before the callback is set
+        are not notified, so getRowsCount should be checked after setting
+        it.
+        """
+        self._rowsChangedCallback = callback
+
+    def _onRowsChanged(self, rowsCount):
+        """ Notify the rows found by the StarTable. Sorted or filtered
+        models do not change, since they are built when the table is loaded.
+        """
+        callback = self._rowsChangedCallback
+        if callback is not None and self._rowMap is None:
+            callback(rowsCount)
+
+    def waitLoaded(self, timeout=None):
+        """ Wait until all the rows of the table have been found.
+        Return True if it finished before the timeout (seconds).
+        """
+        return self._starTable.waitLoaded(timeout)
+
+    def getValue(self, row, col):
+        """ Return the value of the item in this row, column. """
+        row = self.getTableRow(row)
+        if self._columnar:
+            return self._getColumnValue(row, col)
+        return self._starTable.getValue(row, col)
+
+    def _getImageRef(self, row, col):
+        """ Return the ImageRef referenced from the given row, column.
+        Unless the ImageRefIndex of the column has already been built, the
+        value is taken from the page of the row, so the first images can
+        be shown without parsing the whole table.
+        """
+        row = self.getTableRow(row)
+        index = self._imageRefIndexes.get(col, None)
+        if index is not None:
+            return index.getRef(row)
+
+        value = str(self._starTable.getValue(row, col))
+        path, imgIndex, slice = ImageRefIndex.parseValue(value)
+        imgPrefix = self._getImagePrefix(col, value)
         if imgPrefix is not None:
-            imgRef.path = os.path.join(imgPrefix, imgRef.path)
+            path = os.path.join(imgPrefix, path)
+        return ImageRef(path, imgIndex, slice)
 
-        return self._imageManager.getData(imgRef)
+    def _getTableSize(self):
+        self._starTable.waitLoaded()
+        return self._starTable.getRowsCount()
+
+    def _readColumn(self, col):
+        # Strings are read as bytes and only kept as categories (see
+        # _getColumnData)
+        return self._starTable.getColumn(col)
+
+    def _getColumnStrings(self, col):
+        data = self._getColumnData(col)
+        if isinstance(data, tuple):
+            categories, codes = data
+            return categories[codes].tolist()
+        return data.astype(str).tolist()
 
 
 class EmStackModel(dv.models.SlicesModel):
@@ -140,7 +752,8 @@ class EmStackModel(dv.models.SlicesModel):
         """
         dv.models.SlicesModel.__init__(self, **kwargs)
         self._path = path
-        self._imageManager = kwargs.get('imageManager', ImageManager())
+        self._imageManager = (kwargs.get('imageManager') or
+                              ImageManager.getDefault())
         x, y, z, n = self._imageManager.getDim(path)
         self._dim = x, y, n
 
@@ -175,7 +788,8 @@ class EmVolumeModel(dv.models.VolumeModel):
         self._path = path
 
         if data is None:
-            self._imageManager = kwargs.get('imageManager', ImageManager())
+            self._imageManager = (kwargs.get('imageManager') or
+                                  ImageManager.getDefault())
             info = self._imageManager.getInfo(path)
             dim = info['dim']
             imgRef = ImageRef(path, 1)
@@ -211,11 +825,15 @@ class EmListModel(dv.models.ListModel):
             - imageManager : (ImageManager) The ImageManager instance that can
                              be used to read images referenced from this list
             - imagePrefixes: (list) The list of image prefixes
+            - thumbnailSize: (int) If provided, getData will return thumbnails
+                             of the images with this size
         """
         self._files = list(files)
-        self._imageManager = kwargs.get('imageManager') or ImageManager()
+        self._imageManager = (kwargs.get('imageManager') or
+                              ImageManager.getDefault())
         self._imagePrefixes = kwargs.get('imagePrefixes') or list()
         self._columnName = kwargs.get('columnName', 'Path')
+        self._thumbnailSize = kwargs.get('thumbnailSize')
 
         self._tableName = ''
         self._tableNames = [self._tableName]
@@ -232,10 +850,8 @@ class EmListModel(dv.models.ListModel):
         """ Return the value of the item in this row, column. """
         return self._files[row]
 
-    def getData(self, row, col=0):
-        """ Return the data (array like) for the item in this row, column.
-         Used by rendering of images in a given cell of the table.
-        """
+    def _getImageRef(self, row, col=0):
+        """ Return the ImageRef referenced from the given row. """
         value = str(self._files[row])
         imgRef = self._imageManager.getRef(value)
 
@@ -250,13 +866,31 @@ class EmListModel(dv.models.ListModel):
         if imgPrefix is not None:
             imgRef.path = os.path.join(imgPrefix, imgRef.path)
 
+        return imgRef
+
+    def getData(self, row, col=0):
+        """ Return the data (array like) for the item in this row, column.
+         Used by rendering of images in a given cell of the table.
+        """
+        imgRef = self._getImageRef(row, col)
+        if self._thumbnailSize:
+            return self._imageManager.getThumbnail(imgRef, self._thumbnailSize)
         return self._imageManager.getData(imgRef)
 
+    def prefetchData(self, rows, col=0, priority=0):
+        """ Load in background the images of the given rows, so further
+        calls to getData will not need to read them from disk.
+        Returns the list of futures created by ImageManager.prefetch.
+        """
+        return self._imageManager.prefetch(
+            [self._getImageRef(row, col) for row in rows], priority=priority)
+
     def getModel(self, row):
         """ Return the model for the given row """
         from ._models_factory import ModelsFactory
         path = self.getValue(row, 0)
         if EmPath.isImage(path):
-            return dv.models.ImageModel(self.getData(row))
+            return dv.models.ImageModel(
+                self._imageManager.getData(self._getImageRef(row)))
         elif EmPath.isVolume(path):
             return ModelsFactory.createVolumeModel(path)
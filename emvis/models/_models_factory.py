@@ -1,31 +1,38 @@
 
 import os
-import numpy as np
 
 import emcore as emc
 import datavis.models as models
 
-from ..utils import EmPath, EmType
-from ._emtable_model import (EmTableModel, EmStackModel, EmVolumeModel,
-                             EmListModel)
+from ..utils import EmPath, EmType, ImageManager
+from ._emtable_model import (EmTableModel, EmPagedTableModel, EmStackModel,
+                             EmVolumeModel, EmListModel)
 from ._empicker import EmPickerModel, RelionPickerModel
 
 
 class ModelsFactory:
     """ Factory class to centralize the creation of Models using the
     underlying classes from em-core.
+    Models read images through the given imageManager or, if None, through
+    the process-wide one (see ImageManager.getDefault).
     """
     @classmethod
-    def createImageModel(cls, path):
-        """ Create an ImageModel reading path as an emc.Image. """
-        image = emc.Image()
+    def createImageModel(cls, path, binning=1, imageManager=None):
+        """ Create an ImageModel reading path as an emc.Image.
+        If binning is greater than 1, the image will be binned by that
+        factor (useful for previews of big micrographs).
+        """
         loc = emc.ImageLocation(path)
-        image.read(loc)
-        return models.ImageModel(
-            data=np.array(image, copy=False), location=(loc.index, loc.path))
+        im = imageManager or ImageManager.getDefault()
+        if binning > 1:
+            x, y, _, _ = im.getDim(path)
+            data = im.getRegion(path, 0, 0, x, y, binning=binning)
+        else:
+            data = im.getData(path)
+        return models.ImageModel(data=data, location=(loc.index, loc.path))
 
     @classmethod
-    def createTableModel(cls, path):
+    def createTableModel(cls, path, **kwargs):
         """
         Creates an `TableModel <datavis.models.TableModel>` reading path as an
         emc.Table.
@@ -33,14 +40,27 @@ class ModelsFactory:
         Args:
             path: (str) The table path
 
+        Keyword Args:
+            paged: (bool) If True, STAR files are read with
+                :class:`~emvis.models.EmPagedTableModel`. Default False.
+            Extra arguments for :class:`~emvis.models.EmTableModel`
+            (e.g. imageManager, thumbnailSize)
+
         Returns:  `TableModel <datavis.models.TableModel>`
         """
+        imageManager = kwargs.get('imageManager')
+        paged = kwargs.pop('paged', False)
         if EmPath.isTable(path):
-            model = EmTableModel(path)
+            if paged:
+                model = EmPagedTableModel(path, **kwargs)
+            else:
+                model = EmTableModel(path, **kwargs)
         elif EmPath.isStack(path):
-            model = models.SlicesTableModel(EmStackModel(path), 'Index')
+            model = models.SlicesTableModel(
+                EmStackModel(path, imageManager=imageManager), 'Index')
         elif EmPath.isVolume(path):
-            slicesModel = EmVolumeModel(path).getSlicesModel(models.AXIS_Z)
+            volModel = EmVolumeModel(path, imageManager=imageManager)
+            slicesModel = volModel.getSlicesModel(models.AXIS_Z)
             model = models.SlicesTableModel(slicesModel, 'Slice')
         else:
             raise Exception("Unknown file type: %s" % path)
@@ -117,31 +137,33 @@ class ModelsFactory:
         return EmTableModel(emc.Table(cols))
 
     @classmethod
-    def createStackModel(cls, path):
+    def createStackModel(cls, path, imageManager=None):
         """
         Creates an `TableModel <datavis.models.TableModel>` reading stack from
         the given path.
 
         Args:
             path: (str) The stack path
+            imageManager: Optional ImageManager to read the images
         """
-        return EmStackModel(path)
+        return EmStackModel(path, imageManager=imageManager)
 
     @classmethod
-    def createVolumeModel(cls, path):
+    def createVolumeModel(cls, path, imageManager=None):
         """
         Creates an `VolumeModel <datavis.models.VolumeModel>` reading image data
         from the given path.
 
         Args:
             path: (str) The volume path
+            imageManager: Optional ImageManager to read the images
         """
-        return EmVolumeModel(path)
+        return EmVolumeModel(path, imageManager=imageManager)
 
     @classmethod
-    def createListModel(cls, files):
+    def createListModel(cls, files, imageManager=None):
         """ Creates an ListModel from the given file path list """
-        return EmListModel(files)
+        return EmListModel(files, imageManager=imageManager)
 
     # FIXME: This method is duplicated with the one in TableModel
     # here seems a good place to have it
@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import print_function
+import threading
 import unittest
 
+import numpy as np
+
 import emvis as emv
 import datavis as dv
 
@@ -52,6 +55,189 @@ class TestEmTableModel(dv.tests.TestBase):
         self.assertEqual(colNames, expectedColNames,
                          "Different column names for table 'model_class_1'")
 
+    def test_imageRefIndex(self):
+        path = self.getDataPaths()[1]
+        model = emv.models.ModelsFactory.createTableModel(path)
+        colNames = [c.getName() for c in model.iterColumns()]
+        col = colNames.index('rlnImageName')
+
+        index = model.getImageRefIndex(col)
+        self.assertIs(model.getImageRefIndex(col), index)
+        self.assertEqual(len(index), model.getRowsCount())
+
+        for row in [0, 1, len(index) - 1]:
+            value = str(model.getValue(row, col))
+            imgRef = index.getRef(row)
+            self.assertEqual(imgRef.index, int(value.split('@')[0]))
+            self.assertTrue(imgRef.path.endswith(value.split('@')[1]))
+
+        # Each group contains the rows of a single file sorted by index
+        groups = index.groupByFile()
+        self.assertEqual(sum(len(rows) for rows in groups.values()),
+                         len(index))
+        for path, rows in groups.items():
+            self.assertTrue(all(r.path == path for r in index.getRefs(rows)))
+            self.assertTrue((index.getIndexes()[rows][1:] >=
+                             index.getIndexes()[rows][:-1]).all())
+
+    def test_asyncData(self):
+        path = self.getDataPaths()[1]
+        ready = []
+        event = threading.Event()
+
+        def onDataReady(row, col):
+            ready.append((row, col))
+            if len(ready) == 3:
+                event.set()
+
+        model = emv.models.ModelsFactory.createTableModel(
+            path, asyncData=True, dataReadyCallback=onDataReady)
+        colNames = [c.getName() for c in model.iterColumns()]
+        col = colNames.index('rlnImageName')
+
+        # Data is not available until it is loaded in background
+        for row in range(3):
+            self.assertIsNone(model.getData(row, col))
+        self.assertTrue(event.wait(30))
+        self.assertEqual(sorted(ready), [(0, col), (1, col), (2, col)])
+
+        syncModel = emv.models.ModelsFactory.createTableModel(path)
+        for row in range(3):
+            self.assertTrue(np.array_equal(model.getData(row, col),
+                                           syncModel.getData(row, col)))
+
+        # Rows that are not visible anymore are cancelled
+        n = min(model.getRowsCount(), 200)
+        for row in range(3, n):
+            model.getData(row, col)
+        visible = range(n - 10, n)
+        self.assertLessEqual(model.setVisibleRows(visible), n - 13)
+        # Only the loads of the visible rows are still pending
+        self.assertEqual(model.setVisibleRows(visible), 0)
+
+    def test_pagedTable(self):
+        path = self.getDataPaths()[1]
+        model = emv.models.ModelsFactory.createTableModel(path)
+        self.assertNotIsInstance(model, emv.models.EmPagedTableModel)
+        rowsCounts = []
+        paged = emv.models.ModelsFactory.createTableModel(
+            path, paged=True, rowsChangedCallback=rowsCounts.append)
+        self.assertIsInstance(paged, emv.models.EmPagedTableModel)
+        self.assertEqual(paged.getTableNames(), model.getTableNames())
+
+        self.assertTrue(paged.waitLoaded(30))
+        self.assertEqual(paged.getRowsCount(), model.getRowsCount())
+        # The found rows are notified until the table is loaded
+        self.assertEqual(rowsCounts[-1], model.getRowsCount())
+        self.assertEqual(rowsCounts, sorted(rowsCounts))
+        colNames = [c.getName() for c in model.iterColumns()]
+        self.assertEqual([c.getName() for c in paged.iterColumns()],
+                         colNames)
+
+        col = colNames.index('rlnImageName')
+        numCol = colNames.index('rlnDefocusU')
+        for row in [0, 999, 1000, model.getRowsCount() - 1]:
+            self.assertEqual(paged.getValue(row, col),
+                             str(model.getValue(row, col)))
+            self.assertAlmostEqual(paged.getValue(row, numCol),
+                                   float(model.getValue(row, numCol)),
+                                   places=2)
+        self.assertTrue(np.array_equal(paged.getData(0, col),
+                                       model.getData(0, col)))
+
+        # Columns are parsed only once, strings are kept as categories
+        self.assertIs(paged.getColumnData(numCol), paged.getColumnData(numCol))
+        categories, codes = paged.getColumnCategories(col)
+        self.assertEqual(len(codes), model.getRowsCount())
+        self.assertEqual(categories[codes[0]], str(model.getValue(0, col)))
+
+    def test_columnar(self):
+        path = self.getDataPaths()[1]
+        model = emv.models.ModelsFactory.createTableModel(path)
+        columnar = emv.models.ModelsFactory.createTableModel(path,
+                                                             columnar=True)
+        colNames = [c.getName() for c in model.iterColumns()]
+        col = colNames.index('rlnImageName')
+        numCol = colNames.index('rlnDefocusU')
+        n = model.getRowsCount()
+
+        defocus = columnar.getColumnData(numCol)
+        self.assertIsInstance(defocus, np.ndarray)
+        self.assertEqual(len(defocus), n)
+        categories, codes = columnar.getColumnCategories(col)
+        self.assertEqual(len(codes), n)
+        self.assertLessEqual(len(categories), n)
+
+        for row in [0, n // 2, n - 1]:
+            self.assertEqual(columnar.getValue(row, col),
+                             str(model.getValue(row, col)))
+            self.assertAlmostEqual(columnar.getValue(row, numCol),
+                                   float(model.getValue(row, numCol)),
+                                   places=2)
+
+    def test_sortFilter(self):
+        path = self.getDataPaths()[1]
+        model = emv.models.ModelsFactory.createTableModel(path,
+                                                          columnar=True)
+        colNames = [c.getName() for c in model.iterColumns()]
+        defocusCol = colNames.index('rlnDefocusU')
+        classCol = colNames.index('rlnClassNumber')
+        n = model.getRowsCount()
+
+        model.sortRows(defocusCol)
+        self.assertEqual(model.getRowsCount(), n)
+        values = [model.getValue(r, defocusCol) for r in range(n)]
+        self.assertEqual(values, sorted(values))
+        model.sortRows(defocusCol, reverse=True)
+        values = [model.getValue(r, defocusCol) for r in range(n)]
+        self.assertEqual(values, sorted(values, reverse=True))
+
+        defocus = model.getColumnData(defocusCol)
+        classes = model.getColumnData(classCol)
+        threshold = float(np.median(defocus))
+        expected = np.count_nonzero((classes == 1) & (defocus > threshold))
+        count = model.filterRows('rlnClassNumber == 1 and rlnDefocusU > %r'
+                                 % threshold)
+        self.assertEqual(count, expected)
+        self.assertEqual(model.getRowsCount(), expected)
+        for r in range(count):
+            self.assertEqual(model.getValue(r, classCol), 1)
+            self.assertGreater(model.getValue(r, defocusCol), threshold)
+
+        model.resetRows()
+        self.assertEqual(model.getRowsCount(), n)
+        self.assertEqual(model.getTableRow(5), 5)
+
+    def test_imageGroups(self):
+        path = self.getDataPaths()[1]
+        model = emv.models.ModelsFactory.createTableModel(path,
+                                                          columnar=True)
+        colNames = [c.getName() for c in model.iterColumns()]
+        col = colNames.index('rlnImageName')
+        n = model.getRowsCount()
+        index = model.getImageRefIndex(col)
+
+        groups = model.getImageGroups(col)
+        self.assertIs(model.getImageGroups(col), groups)
+        self.assertEqual(sum(len(rows) for rows in groups.values()), n)
+        for path, rows in groups.items():
+            refs = index.getRefs(rows)
+            self.assertTrue(all(r.path == path for r in refs))
+            indexes = [r.index for r in refs]
+            self.assertEqual(indexes, sorted(indexes))
+
+        # Groups of the selected rows of a sorted model
+        model.sortRows(colNames.index('rlnDefocusU'))
+        selection = list(range(0, n, max(n // 50, 1)))
+        loaded = []
+        for rows, data in model.iterDataGroups(col, selection):
+            self.assertEqual(len(rows), len(data))
+            for row, rowData in zip(rows, data):
+                self.assertTrue(np.array_equal(rowData,
+                                               model.getData(row, col)))
+            loaded.extend(rows)
+        self.assertEqual(sorted(loaded), selection)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,12 @@
 
 import os
+import shutil
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 import datavis as dv
 import emcore as emc
@@ -35,6 +41,451 @@ class TestImageManager(dv.tests.TestBase):
         # some levels up
         self._checkPrefix(path1, os.path.dirname(os.path.dirname(path1)))
 
+    def test_findImagePrefixes(self):
+        path0 = self.getDataPaths()[0]
+        table = emc.Table()
+        table.read(path0)
+        imgPaths = [str(row['rlnImageName']) for row in table]
+
+        emv.utils.ImageManager.clearPrefixCache()
+        prefixes = emv.utils.ImageManager.findImagePrefixes(imgPaths, path0)
+        self.assertEqual(len(prefixes), len(imgPaths))
+        self.assertEqual(set(prefixes), {os.path.dirname(path0)})
+
+        # Not found prefixes should also be remembered
+        badPath = '1@NonExistingDir/particles.mrcs'
+        for _ in range(2):
+            self.assertIsNone(
+                emv.utils.ImageManager.findImagePrefix(badPath, path0))
+
+    def test_findImagePrefixNoRoot(self):
+        # Tables created in memory have no path to search from
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        ImageManager = emv.utils.ImageManager
+        ImageManager.clearPrefixCache()
+        self.assertEqual(
+            ImageManager.findImagePrefix('1@%s' % stackPath, None), '')
+        self.assertIsNone(
+            ImageManager.findImagePrefix('1@NonExistingDir/s.mrcs', None))
+
+    def test_imageCache(self):
+        cache = emv.utils.ImageCache(100)
+        for i in range(5):
+            cache.put(i, 'image%d' % i, 30)
+
+        # Only the last 3 items fit in the cache
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.getSize(), 90)
+        self.assertNotIn(1, cache)
+
+        # Access item 2 so it becomes the most recently used one
+        self.assertEqual(cache.get(2), 'image2')
+        cache.pin(3)
+        cache.put(5, 'image5', 30)
+        cache.put(6, 'image6', 30)
+        # Item 3 is pinned, so 4 and 2 should have been evicted
+        self.assertIn(3, cache)
+        self.assertNotIn(4, cache)
+        self.assertNotIn(2, cache)
+
+        cache.unpin(3)
+        cache.put(7, 'image7', 30)
+        self.assertNotIn(3, cache)
+        self.assertLessEqual(cache.getSize(), 100)
+
+        # Items that can not fit are not stored and evict nothing
+        stats = cache.getStats()
+        self.assertFalse(cache.put(8, 'image8', 200))
+        self.assertNotIn(8, cache)
+        self.assertEqual(cache.getStats(), stats)
+
+    def test_openFilesPool(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        micPath = self.getPath("xmipp_tutorial", "micrographs",
+                               "BPV_1386.mrc")
+        im = emv.utils.ImageManager(maxOpenFiles=2)
+        # Interleave the access to both files, they should be opened once
+        for i in range(1, 6):
+            im.getDim(stackPath)
+            im.getDim(micPath)
+
+        counts = im.getStats()['files']
+        self.assertEqual(counts['open'], 2)
+        self.assertEqual(counts['opens'], 2)
+        self.assertEqual(counts['reuses'], 8)
+
+        im.close()
+        self.assertEqual(im.getStats()['files']['open'], 0)
+
+    def test_concurrentReads(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        refs = [emv.utils.ImageRef(stackPath, i) for i in range(1, 101)]
+        im = emv.utils.ImageManager(maxCacheSize=1)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda r: im.getData(r, copy=True),
+                                        refs))
+
+        im2 = emv.utils.ImageManager()
+        for ref, data in zip(refs, results):
+            self.assertTrue(np.array_equal(data, im2.getData(ref)))
+
+    def test_prefetch(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        refs = [emv.utils.ImageRef(stackPath, i) for i in range(1, 51)]
+        im = emv.utils.ImageManager()
+
+        futures = im.prefetch(refs[:40], priority=1)
+        self.assertEqual(len(futures), 40)
+        # Prefetching again the same images should return the same futures
+        self.assertEqual(im.prefetch(refs[:2]), futures[:2])
+
+        im.prefetch(refs[40:])
+        im.cancel(refs[40:])
+
+        # Shared tasks are not cancelled while they are still requested
+        shared = im.prefetch(refs[45:46])[0]
+        im.prefetch(refs[45:46])
+        im.cancel(refs[45:46])
+        self.assertFalse(shared.cancelled())
+
+        im2 = emv.utils.ImageManager()
+        for ref, future in zip(refs, futures):
+            self.assertTrue(np.array_equal(future.result(), im2.getData(ref)))
+        im.close()
+
+    def test_getDataBatch(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        indexes = [7, 3, 50, 1, 2, 99]
+        refs = [emv.utils.ImageRef(stackPath, i) for i in indexes]
+        im = emv.utils.ImageManager()
+        # Load one of them in the cache
+        im.getData(refs[2])
+
+        batch = im.getDataBatch(refs)
+        self.assertEqual(batch.shape, (len(refs), 128, 128))
+
+        im2 = emv.utils.ImageManager()
+        for ref, data in zip(refs, batch):
+            self.assertTrue(np.array_equal(data, im2.getData(ref)))
+
+    def test_mmap(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        volPath = self.getPath("resmap", "t20s_proteasome_full.map")
+        im = emv.utils.ImageManager()
+        imMmap = emv.utils.ImageManager(useMmap=True)
+
+        for i in [1, 2, 50, 100]:
+            ref = emv.utils.ImageRef(stackPath, i)
+            data = imMmap.getData(ref)
+            self.assertFalse(data.flags.writeable)
+            self.assertTrue(np.array_equal(data, im.getData(ref)))
+            self.assertTrue(imMmap.getData(ref, copy=True).flags.writeable)
+
+        ref = emv.utils.ImageRef(volPath, 1)
+        data = imMmap.getData(ref)
+        self.assertEqual(data.shape, (300, 300, 300))
+        self.assertTrue(np.array_equal(data, im.getData(ref)))
+
+        refs = [emv.utils.ImageRef(stackPath, i) for i in [4, 5, 6, 1, 10]]
+        self.assertTrue(np.array_equal(imMmap.getDataBatch(refs),
+                                       im.getDataBatch(refs)))
+
+    def test_getThumbnail(self):
+        micPath = self.getPath("xmipp_tutorial", "micrographs",
+                               "BPV_1386.mrc")
+        im = emv.utils.ImageManager()
+        thumb = im.getThumbnail(micPath, 300)
+        # The micrograph is 9216 x 9441, binned by 16
+        self.assertEqual(thumb.shape, (590, 576))
+        # The full image should not be in the cache
+        self.assertEqual(im.getCacheSize(), 0)
+
+        # Smaller levels should be already computed
+        thumb2 = im.getThumbnail(micPath, 100)
+        self.assertEqual(thumb2.shape, (147, 144))
+        self.assertAlmostEqual(float(thumb2[0, 0]),
+                               float(thumb[:4, :4].mean()), places=2)
+
+    def test_thumbnailDiskCache(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        ref = emv.utils.ImageRef(stackPath, 10)
+        cacheDir = tempfile.mkdtemp()
+        try:
+            thumb = emv.utils.ImageManager(
+                thumbnailDir=cacheDir).getThumbnail(ref, 64)
+            # A new ImageManager should find the thumbnail on disk, without
+            # reading the image
+            im = emv.utils.ImageManager(thumbnailDir=cacheDir)
+            self.assertTrue(np.array_equal(im.getThumbnail(ref, 64), thumb))
+            self.assertEqual(im.getStats()['reads']['count'], 0)
+        finally:
+            shutil.rmtree(cacheDir)
+
+    def test_headerCache(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        im = emv.utils.ImageManager()
+        self.assertEqual(im.getDim(stackPath), (128, 128, 1, 100))
+        im.close()  # Close files, so we can check they are not reopened
+
+        info = im.getInfo(stackPath)
+        info['dim'].n = 1  # Modifying the result should not alter the cache
+        dims = im.getDims(['%d@%s' % (i, stackPath) for i in range(1, 11)])
+        self.assertEqual(dims, [(128, 128, 1, 100)] * 10)
+        self.assertEqual(im.getStats()['files']['opens'], 1)
+
+        micsDir = os.path.dirname(self.getPath("xmipp_tutorial", "micrographs",
+                                               "BPV_1386.mrc"))
+        infos = im.scanDir(micsDir)
+        self.assertTrue(infos)
+        for path, info in infos.items():
+            self.assertEqual(info['ext'], emv.utils.EmPath.getExt(path))
+
+    def test_stats(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        refs = [emv.utils.ImageRef(stackPath, i) for i in range(1, 11)]
+        im = emv.utils.ImageManager(maxReadAhead=0)
+        for ref in refs:
+            im.getData(ref)
+
+        before = im.getStats()
+        self.assertEqual(before['cache']['misses'], 10)
+        self.assertEqual(before['reads']['count'], 10)
+        self.assertEqual(sum(before['latency_by_file'][stackPath]), 10)
+        self.assertEqual(sum(before['latency_by_format']['.mrc']), 10)
+
+        for ref in refs[:5]:
+            im.getData(ref)
+        diff = im.diffStats(before, im.getStats())
+        self.assertEqual(diff['cache']['hits'], 5)
+        self.assertEqual(diff['cache']['misses'], 0)
+        self.assertEqual(diff['reads']['count'], 0)
+
+        im.resetStats()
+        self.assertEqual(im.getStats()['reads']['count'], 0)
+
+    def test_sharedCache(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        ref = emv.utils.ImageRef(stackPath, 3)
+        im1 = emv.utils.ImageManager(sharedCache=True)
+        im2 = emv.utils.ImageManager(sharedCache=True)
+        try:
+            data1 = im1.getData(ref)
+            self.assertFalse(data1.flags.writeable)
+            # The second manager should attach to the segment of the first
+            data2 = im2.getData(ref)
+            self.assertTrue(np.array_equal(data1, data2))
+            self.assertEqual(im2.getStats()['shared']['attaches'], 1)
+            self.assertEqual(im2.getStats()['reads']['count'], 0)
+        finally:
+            im2.clearCache()
+            im1.clearCache()
+
+    def test_sharedCacheStale(self):
+        import struct
+        import subprocess
+        import sys
+        from multiprocessing import shared_memory
+        Cache = emv.utils.SharedImageCache
+        cache = Cache(1024 * 1024)
+        data = np.arange(16, dtype=np.float32)
+        # PID of a process that is not running anymore
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proc.wait()
+
+        def createSegment(key, pid):
+            # Segment left not ready by the given process
+            shm = shared_memory.SharedMemory(name=cache._getName(key),
+                                             create=True, size=256)
+            struct.pack_into(Cache.HEADER_FORMAT, shm.buf, 0, Cache.MAGIC,
+                             0, b'<f4', 1, 16, 0, 0, 0, pid, b'token')
+            return shm
+
+        # The writer crashed, so the segment is replaced
+        stale = createSegment(('stale', 1), proc.pid)
+        # The writer is still running, so the segment is not touched
+        live = createSegment(('live', 1), os.getpid())
+        try:
+            shared = cache.put(('stale', 1), data)
+            self.assertIsNot(shared, data)
+            self.assertTrue(np.array_equal(shared, data))
+            self.assertTrue(np.array_equal(cache.get(('stale', 1)), data))
+
+            self.assertIs(cache.put(('live', 1), data), data)
+            self.assertIsNone(cache.get(('live', 1)))
+        finally:
+            cache.clear()
+            stale.close()
+            live.unlink()
+            live.close()
+
+    def test_getSlice(self):
+        volPath = self.getPath("resmap", "t20s_proteasome_full.map")
+        im = emv.utils.ImageManager()
+        vol = emv.utils.ImageManager().getData(volPath)
+
+        # Slices are parsed from the slice@index@path form
+        zSlice = im.getData('150@1@%s' % volPath)
+        self.assertTrue(np.array_equal(zSlice, vol[149]))
+        ySlice = im.getSlice(volPath, 10, emv.utils.Y_AXIS)
+        self.assertTrue(np.array_equal(ySlice, vol[:, 9, :]))
+        xSlice = im.getSlice(
+            emv.utils.ImageRef(volPath, 1, 300, emv.utils.X_AXIS))
+        self.assertTrue(np.array_equal(xSlice, vol[:, :, 299]))
+
+        # The whole volume should not be in the cache
+        self.assertEqual(im.getCacheSize(), 0)
+
+    def test_getRegion(self):
+        micPath = self.getPath("xmipp_tutorial", "micrographs",
+                               "BPV_1386.mrc")
+        im = emv.utils.ImageManager()
+        mic = emv.utils.ImageManager().getData(micPath)
+
+        region = im.getRegion(micPath, 1000, 2000, 512, 256)
+        self.assertTrue(np.array_equal(region, mic[2000:2256, 1000:1512]))
+        # Regions are clipped to the image boundaries
+        region = im.getRegion(micPath, 9000, 9400, 512, 512)
+        self.assertEqual(region.shape, (41, 216))
+
+        overview = im.getRegion(micPath, 0, 0, 9216, 9441, binning=8)
+        self.assertEqual(overview.shape, (1180, 1152))
+        self.assertAlmostEqual(float(overview[0, 0]),
+                               float(mic[:8, :8].mean()), places=2)
+
+    def test_cacheType(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        ref = emv.utils.ImageRef(stackPath, 1)
+        im = emv.utils.ImageManager()
+        img = im.getImage(ref)
+        data = im.getData(ref)
+        # The array uses the image type and shares its buffer
+        self.assertEqual(data.dtype,
+                         emv.utils.EmType.toNumpy(img.getType()))
+        self.assertTrue(np.shares_memory(data, np.asarray(img)))
+
+        for cacheType, dtype in [('float16', np.float16),
+                                 ('uint8', np.uint8)]:
+            im2 = emv.utils.ImageManager(cacheType=cacheType)
+            reduced = im2.getData(ref)
+            self.assertEqual(reduced.dtype, dtype)
+            self.assertEqual(reduced.shape, data.shape)
+            self.assertEqual(im2.getCacheSize(), reduced.nbytes)
+            self.assertIs(im2.getData(ref), reduced)
+
+        self.assertEqual(reduced.min(), 0)
+        self.assertEqual(reduced.max(), 255)
+
+        with self.assertRaises(Exception):
+            emv.utils.ImageManager(cacheType='int4')
+
+    def test_coldCache(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        refs = [emv.utils.ImageRef(stackPath, i) for i in range(1, 21)]
+        # Room for only 5 images (128 x 128 float) in the cache
+        im = emv.utils.ImageManager(maxCacheSize=0.3125, maxColdCacheSize=10,
+                                    maxReadAhead=0)
+        images = [np.array(im.getData(ref)) for ref in refs]
+
+        stats = im.getStats()
+        self.assertEqual(stats['cache']['items'], 5)
+        self.assertEqual(stats['cold']['items'], 15)
+        self.assertLess(stats['cold']['bytes'], stats['cold']['raw_bytes'])
+
+        # Evicted images are recovered from the compressed tier
+        for ref, data in zip(refs[:5], images[:5]):
+            self.assertTrue(np.array_equal(im.getData(ref), data))
+        diff = im.diffStats(stats, im.getStats())
+        self.assertEqual(diff['reads']['count'], 0)
+        self.assertEqual(diff['cold']['hits'], 5)
+
+        cache = emv.utils.CompressedCache(1024 * 1024, method='lzma')
+        cache.put('a', images[0])
+        self.assertTrue(np.array_equal(cache.get('a'), images[0]))
+        self.assertIsNone(cache.get('b'))
+
+    def test_readAhead(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        im = emv.utils.ImageManager(maxReadAhead=4)
+        # Random access should not trigger the read-ahead
+        for i in [5, 50, 7, 30]:
+            im.getData(emv.utils.ImageRef(stackPath, i))
+        self.assertEqual(im.getStats()['reads']['read_ahead'], 0)
+
+        for i in range(1, 11):
+            im.getData(emv.utils.ImageRef(stackPath, i))
+        self.assertGreater(im.getStats()['reads']['read_ahead'], 0)
+
+        # The next image was requested in background, wait for it
+        nextRef = emv.utils.ImageRef(stackPath, 11)
+        im.prefetch([nextRef])[0].result()
+        reads = im.getStats()['reads']['count']
+        im.getData(nextRef)
+        self.assertEqual(im.getStats()['reads']['count'], reads)
+        im.close()
+
+    def test_cacheKeys(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        tmpDir = tempfile.mkdtemp()
+        try:
+            copyPath = os.path.join(tmpDir, 'stack2D.mrc')
+            linkPath = os.path.join(tmpDir, 'link.mrc')
+            shutil.copy(stackPath, copyPath)
+            os.symlink(copyPath, linkPath)
+
+            im = emv.utils.ImageManager(maxReadAhead=0)
+            # The same file through different paths is read only once
+            data = im.getData(emv.utils.ImageRef(copyPath, 100))
+            for path in [linkPath, os.path.relpath(copyPath)]:
+                self.assertTrue(np.array_equal(
+                    im.getData(emv.utils.ImageRef(path, 100)), data))
+            self.assertEqual(im.getStats()['reads']['count'], 1)
+
+            pinnedRef = emv.utils.ImageRef(copyPath, 100)
+            im.pin(pinnedRef)
+            self.assertEqual(im.getStats()['cache']['pinned'], 1)
+
+            # Overwrite the last image, the cached one should not be used
+            time.sleep(emv.utils.STAT_TTL)
+            with open(copyPath, 'r+b') as f:
+                f.seek(-data.nbytes, os.SEEK_END)
+                f.write(b'\0' * data.nbytes)
+            time.sleep(emv.utils.STAT_TTL)
+            data = im.getData(emv.utils.ImageRef(linkPath, 100))
+            self.assertFalse(data.any())
+            # The key pinned before the change should be released
+            im.unpin(pinnedRef)
+            self.assertEqual(im.getStats()['cache']['pinned'], 0)
+            im.close()
+        finally:
+            shutil.rmtree(tmpDir)
+
+    def test_defaultManager(self):
+        stackPath = self.getPath("emx", "alignment", "Test2", "stack2D.mrc")
+        ImageManager = emv.utils.ImageManager
+        previous = ImageManager.getDefault()
+        im = ImageManager.setDefault(maxCacheSize=10, maxReadAhead=0)
+        try:
+            self.assertIs(ImageManager.getDefault(), im)
+
+            # Models share the default manager unless other one is provided
+            models = [emv.models.ModelsFactory.createStackModel(stackPath)
+                      for _ in range(2)]
+            models[0].getData(0)
+            models[1].getData(0)
+            self.assertEqual(im.getStats()['reads']['count'], 1)
+
+            im2 = ImageManager(maxReadAhead=0)
+            model = emv.models.ModelsFactory.createStackModel(
+                stackPath, imageManager=im2)
+            model.getData(0)
+            self.assertEqual(im2.getStats()['reads']['count'], 1)
+            self.assertEqual(im.getStats()['reads']['count'], 1)
+            im2.close()
+        finally:
+            # Restore the default manager used by the other tests
+            ImageManager.setDefault(previous)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,7 +2,17 @@ import datavis as dv
 
 from ._emtype import EmType
 from ._empath import EmPath
-from ._image_manager import ImageManager, ImageRef
+from ._image_manager import (ImageManager, ImageRef, X_AXIS, Y_AXIS,
+                             Z_AXIS, STAT_TTL)
+from ._image_ref_index import ImageRefIndex
+from ._image_cache import ImageCache
+from ._compressed_cache import CompressedCache
+from ._disk_cache import DiskCache
+from ._io_stats import IOStats
+from ._shared_cache import SharedImageCache
+from ._mrc_file import MrcFile
+from ._star_file import StarFile, StarTable
+from ._row_filter import RowFilter
 
 
 MOVIE_SIZE = 1000
@@ -0,0 +1,117 @@
+
+import lzma
+import threading
+import zlib
+
+import numpy as np
+
+from ._image_cache import ImageCache
+
+
+class CompressedCache:
+    """
+    Cache of numpy arrays kept compressed in memory, bounded by the total
+    size of the compressed data. It is used by the ImageManager as a second
+    tier for the images evicted from its cache, so they can be recovered
+    without reading the files again.
+
+    Before compression, the bytes of the array elements are shuffled (the
+    first byte of all elements, then the second one...), which improves the
+    compression ratio of floating point data.
+    """
+    METHODS = ['zlib', 'lzma']
+
+    def __init__(self, maxSize, method='zlib', level=1):
+        """
+        Create a new CompressedCache.
+
+        Args:
+            maxSize: (int) Maximum number of bytes of compressed data.
+            method: (str) Compression method, either 'zlib' or 'lzma'.
+            level: (int) Compression level (or lzma preset). Low values are
+                faster, which is usually more important here.
+        """
+        if method not in self.METHODS:
+            raise Exception("Invalid compression method: %s" % method)
+
+        self._method = method
+        self._level = level
+        self._cache = ImageCache(maxSize, onEvict=self._onEvict)
+        self._lock = threading.Lock()
+        # Uncompressed size of the stored arrays
+        self._rawSize = 0
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def __len__(self):
+        return len(self._cache)
+
+    def getSize(self):
+        """ Return the number of bytes of compressed data. """
+        return self._cache.getSize()
+
+    def getMaxSize(self):
+        return self._cache.getMaxSize()
+
+    def _onEvict(self, key, item):
+        with self._lock:
+            self._rawSize -= item[1].itemsize * int(np.prod(item[2]))
+
+    def _compress(self, data):
+        data = np.ascontiguousarray(data)
+        raw = data.view(np.uint8).reshape(-1, data.dtype.itemsize).T.tobytes()
+        if self._method == 'zlib':
+            return zlib.compress(raw, self._level)
+        return lzma.compress(raw, preset=self._level)
+
+    def _decompress(self, item):
+        buf, dtype, shape = item
+        if self._method == 'zlib':
+            raw = zlib.decompress(buf)
+        else:
+            raw = lzma.decompress(buf)
+        shuffled = np.frombuffer(raw, dtype=np.uint8)
+        shuffled = shuffled.reshape(dtype.itemsize, -1)
+        return np.ascontiguousarray(shuffled.T).view(dtype).reshape(shape)
+
+    def get(self, key):
+        """ Return a new array with the data stored for the key, or None
+        if the key is not in the cache.
+        """
+        item = self._cache.get(key, None)
+        return None if item is None else self._decompress(item)
+
+    def put(self, key, data):
+        """ Compress the array and store it for the given key. """
+        item = (self._compress(data), data.dtype, data.shape)
+        self.remove(key)
+        with self._lock:
+            self._rawSize += data.nbytes
+        if not self._cache.put(key, item, len(item[0])):
+            with self._lock:
+                self._rawSize -= data.nbytes
+
+    def remove(self, key):
+        """ Remove the given key from the cache. """
+        item = self._cache.remove(key)
+        if item is not None:
+            self._onEvict(key, item)
+
+    def getStats(self):
+        """ Return a dict with the cache counters and current usage. Besides
+        the values of ImageCache.getStats, 'raw_bytes' is the uncompressed
+        size of the stored arrays.
+        """
+        stats = self._cache.getStats()
+        with self._lock:
+            stats['raw_bytes'] = self._rawSize
+        return stats
+
+    def resetStats(self):
+        self._cache.resetStats()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._rawSize = 0
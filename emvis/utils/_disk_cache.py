@@ -0,0 +1,121 @@
+
+import os
+import hashlib
+import threading
+import numpy as np
+
+
+class DiskCache:
+    """
+    Cache of numpy arrays stored as .npy files in a directory, bounded by
+    the total size of the files. When the limit is exceeded, the least
+    recently used files are removed.
+
+    Keys can be any value with a stable repr (e.g. tuples of str and int).
+    Keys should include everything that identifies the data (e.g. the
+    modification time of the source file), so outdated entries are just
+    never used again and they will be removed when space is needed.
+    """
+    def __init__(self, path, maxSize):
+        """
+        Create a new DiskCache.
+
+        Args:
+            path: (str) Directory where the files will be stored. It will be
+                created if it does not exist.
+            maxSize: (int) Maximum number of bytes used by the files.
+        """
+        self._path = path
+        self._maxSize = maxSize
+        self._size = None  # Computed when first needed
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    @classmethod
+    def getDefaultPath(cls):
+        """ Return the default cache directory for thumbnails. """
+        cacheHome = (os.environ.get('XDG_CACHE_HOME') or
+                     os.path.join(os.path.expanduser('~'), '.cache'))
+        return os.path.join(cacheHome, 'emvis', 'thumbnails')
+
+    def getPath(self):
+        return self._path
+
+    def _getFile(self, key):
+        """ Return the filename where the data for the key is stored. """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self._path, digest[:2], digest + '.npy')
+
+    def _iterFiles(self):
+        """ Iterate over (path, stat) of all the files in the cache. """
+        for root, dirs, files in os.walk(self._path):
+            for fn in files:
+                if fn.endswith('.npy'):
+                    path = os.path.join(root, fn)
+                    try:
+                        yield path, os.stat(path)
+                    except OSError:  # Removed by other process
+                        pass
+
+    def get(self, key):
+        """ Return the array stored for the key, or None if not found. """
+        fn = self._getFile(key)
+        try:
+            data = np.load(fn, allow_pickle=False)
+            # Update the modification time to mark it as recently used
+            os.utime(fn, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return data
+
+    def put(self, key, data):
+        """ Store the array for the given key. """
+        fn = self._getFile(key)
+        dirName = os.path.dirname(fn)
+        tmpFn = '%s.%d.%d.tmp' % (fn, os.getpid(), threading.get_ident())
+        try:
+            if not os.path.exists(dirName):
+                os.makedirs(dirName)
+            with open(tmpFn, 'wb') as f:
+                np.save(f, data, allow_pickle=False)
+            # Atomically replace, so readers never see incomplete files
+            os.replace(tmpFn, fn)
+            size = os.path.getsize(fn)
+        except (IOError, OSError):
+            if os.path.exists(tmpFn):
+                os.remove(tmpFn)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(st.st_size for _, st in self._iterFiles())
+            else:
+                self._size += size
+            if self._size > self._maxSize:
+                self._shrink()
+
+    def _shrink(self):
+        """ Remove the least recently used files until the size is under
+        90% of the limit. Should be called with the lock acquired.
+        """
+        files = sorted(self._iterFiles(), key=lambda f: f[1].st_mtime)
+        self._size = sum(st.st_size for _, st in files)
+        for path, st in files:
+            if self._size <= 0.9 * self._maxSize:
+                break
+            try:
+                os.remove(path)
+                self._size -= st.st_size
+            except OSError:
+                pass
+
+    def clear(self):
+        """ Remove all files from the cache. """
+        with self._lock:
+            for path, _ in list(self._iterFiles()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
@@ -21,15 +21,18 @@ class EmType:
     }
 
     TYPE_TO_NUMPY = {
-        emc.typeInt8: np.uint8,
+        emc.typeBool: np.bool_,
+        emc.typeInt8: np.int8,
         emc.typeUInt8: np.uint8,
-        emc.typeInt16: np.uint16,
+        emc.typeInt16: np.int16,
         emc.typeUInt16: np.uint16,
-        emc.typeInt32: np.uint32,
+        emc.typeInt32: np.int32,
         emc.typeUInt32: np.uint32,
-        emc.typeInt64: np.uint64,
-        emc.typeUInt64: np.uint64
-    }  # FIXME [hv] the others?
+        emc.typeInt64: np.int64,
+        emc.typeUInt64: np.uint64,
+        emc.typeFloat: np.float32,
+        emc.typeDouble: np.float64
+    }
 
     MODELS_TYPE_TO_EM_TYPE = {
         models.TYPE_BOOL: emc.typeBool,
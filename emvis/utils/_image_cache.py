@@ -0,0 +1,170 @@
+
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """
+    Least-recently-used cache bounded by the total size (in bytes) of the
+    stored items. Items can be pinned to prevent their eviction, for example
+    while they are being displayed. All methods are thread-safe.
+    """
+    def __init__(self, maxSize, onEvict=None):
+        """
+        Create a new ImageCache.
+
+        Args:
+            maxSize: (int) Maximum number of bytes that can be stored in the
+                cache (not counting pinned items that exceed the limit).
+            onEvict: Optional function called as onEvict(key, value) for
+                each evicted item (e.g. to keep it in a second tier). It is
+                called without holding the cache lock.
+        """
+        self._maxSize = maxSize
+        self._onEvict = onEvict
+        self._size = 0
+        # Map between keys and (value, size) pairs, the most recently used
+        # items are kept at the end
+        self._items = OrderedDict()
+        # Pin count for each pinned key
+        self._pinned = dict()
+        self._lock = threading.RLock()
+        self.resetStats()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def getSize(self):
+        """ Return the number of bytes currently stored in the cache. """
+        return self._size
+
+    def getMaxSize(self):
+        """ Return the maximum number of bytes allowed in the cache. """
+        return self._maxSize
+
+    def setMaxSize(self, maxSize):
+        """ Change the maximum size of the cache, evicting items if needed. """
+        with self._lock:
+            self._maxSize = maxSize
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def get(self, key, default=None):
+        """ Return the value associated with key, or default if not found.
+        The item will be marked as the most recently used one.
+        """
+        with self._lock:
+            item = self._items.get(key, None)
+            if item is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, size):
+        """ Store the value with the given size (in bytes) in the cache.
+        Least recently used (and not pinned) items will be evicted until
+        the cache size is under the limit. Items bigger than the whole
+        cache are not stored (and nothing is evicted for them).
+        Return True if the item was stored.
+        """
+        with self._lock:
+            self.remove(key)
+            if size > self._maxSize:
+                return False
+            self._items[key] = (value, size)
+            self._size += size
+            evicted = self._evict()
+        self._notify(evicted)
+        return True
+
+    def remove(self, key):
+        """ Remove the given key from the cache (even if it is pinned).
+        Return the removed value or None if the key was not in the cache.
+        """
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            self._size -= item[1]
+            return item[0]
+
+    def pin(self, key):
+        """ Prevent the item with this key to be evicted until unpin is
+        called. Pins are counted, so pin/unpin calls should be balanced.
+        It is possible to pin a key before the item is stored.
+        """
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key):
+        """ Release one pin of the given key. """
+        evicted = []
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+                evicted = self._evict()
+        self._notify(evicted)
+
+    def isPinned(self, key):
+        with self._lock:
+            return key in self._pinned
+
+    def getStats(self):
+        """ Return a dict with the cache counters and current usage. """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'items': len(self._items),
+                'pinned': len(self._pinned),
+                'bytes': self._size,
+                'max_bytes': self._maxSize
+            }
+
+    def resetStats(self):
+        """ Set the hits, misses and evictions counters to zero. """
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def clear(self):
+        """ Remove all items from the cache. Pins are also released. """
+        with self._lock:
+            self._items.clear()
+            self._pinned.clear()
+            self._size = 0
+
+    def _evict(self):
+        """ Remove least recently used items until the size is under the
+        limit. Pinned items are skipped.
+        Return the list of (key, value) of the evicted items.
+        """
+        evicted = []
+        if self._size <= self._maxSize:
+            return evicted
+
+        for key in list(self._items.keys()):
+            if self._size <= self._maxSize:
+                break
+            if key not in self._pinned:
+                evicted.append((key, self.remove(key)))
+                self._evictions += 1
+        return evicted
+
+    def _notify(self, evicted):
+        """ Call the onEvict function (if any) for the evicted items. """
+        if self._onEvict is not None:
+            for key, value in evicted:
+                self._onEvict(key, value)
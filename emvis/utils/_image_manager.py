@@ -2,49 +2,272 @@
 # -*- coding: utf-8 -*-
 
 import os
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 
 import emcore as emc
 from datavis.utils import py23
 from ._empath import EmPath
 from ._emtype import EmType
+from ._image_cache import ImageCache
+from ._compressed_cache import CompressedCache
+from ._disk_cache import DiskCache
+from ._mrc_file import MrcFile
+from ._io_stats import IOStats
+from ._shared_cache import SharedImageCache
 
 X_AXIS = 0
 Y_AXIS = 1
 Z_AXIS = 2
 
+# Maximum number of file headers kept in the ImageManager
+HEADER_CACHE_SIZE = 10000
+
+# Minimum size of the smallest thumbnail level
+THUMBNAIL_MIN_SIZE = 16
+
+# Number of files whose access pattern is tracked for read-ahead
+ACCESS_PATTERNS_SIZE = 32
+
+# Seconds during which the result of os.stat for a file is reused
+STAT_TTL = 1.0
+
+# Maximum size (in bytes) of the last volume kept by getSlice when the
+# volume does not fit in the cache
+LAST_VOLUME_SIZE = 1024 * 1024 * 1024
+
+
+def binData(data, factor):
+    """ Return the 2D data binned by the given factor, averaging each
+    block of factor x factor pixels. Remaining rows/columns are discarded.
+    """
+    if factor <= 1:
+        return data
+    h, w = data.shape[0] // factor, data.shape[1] // factor
+    blocks = data[:h * factor, :w * factor].reshape(h, factor, w, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def reduceData(data, dataType):
+    """ Return the data converted to a smaller type, to be used for display.
+    With 'float16' values are kept (clipped to the float16 range), with
+    'uint8' values are linearly scaled from [min, max] to [0, 255].
+    """
+    if dataType == 'float16':
+        info = np.finfo(np.float16)
+        return np.clip(data, info.min, info.max).astype(np.float16)
+    elif dataType == 'uint8':
+        dMin, dMax = float(data.min()), float(data.max())
+        scale = 255.0 / (dMax - dMin) if dMax > dMin else 0.0
+        out = np.subtract(data, dMin, dtype=np.float32)
+        out *= scale
+        return np.rint(out, out=out).astype(np.uint8)
+    raise Exception("Invalid reduced data type: %s" % dataType)
+
 
 class ImageManager:
     """
     The image manager for centralize read/manage image operations.
     Contains a internal image cache for loaded image access and thumbnails.
+
+    The ImageManager can be used from several threads. Reads from different
+    files can run in parallel, while reads from the same open file are
+    serialized.
     """
-    def __init__(self, maxCacheSize=100, maxOpenFiles=10):
+    # Results of findImagePrefix (including not found ones) for each
+    # (working dir, rootPath, image directory)
+    _prefixCache = dict()
+
+    # ImageManager shared by all models and views (see getDefault)
+    _default = None
+    _defaultLock = threading.Lock()
+
+    def __init__(self, maxCacheSize=100, maxOpenFiles=10, maxWorkers=4,
+                 useMmap=False, maxThumbnailCacheSize=20,
+                 thumbnailDir=None, maxThumbnailDirSize=500,
+                 sharedCache=False, cacheType=None, maxColdCacheSize=50,
+                 coldCompression='zlib', maxReadAhead=8):
         self._imgData = dict()
         # Internally convert from Mb to bytes (default 100 Mb)
         self._maxCacheSize = maxCacheSize * 1024 * 1024
         self._maxOpenFiles = maxOpenFiles
 
-        # FIXME: We can have many open ImageFile (until maxOpenFiles)
-        # to prevent opening many times the same file
-        self._imgIO = emc.ImageFile()
-        self._img = emc.Image()
-        self._lastOpenedFile = None
+        # Pool of open ImageFile objects (keyed by path) to prevent opening
+        # many times the same file. The least recently used file is closed
+        # when there are more than maxOpenFiles open.
+        self._openFiles = OrderedDict()
+        # Protect the open files pool and other shared structures
+        self._lock = threading.RLock()
+
+        # If useMmap is True, data from MRC files is read from a memory
+        # map of the file (see MrcFile). Files that can not be mapped are
+        # stored as None, so they are read with emcore
+        self._useMmap = useMmap
+        self._mrcFiles = OrderedDict()
+
+        # Headers information (dimensions and type) of the files, keyed by
+        # (path, modification time, size), so changed files are read again
+        self._headerCache = OrderedDict()
+        # Recent results of os.stat (and the time they were taken) for each
+        # path, used to identify the files and detect their changes
+        self._statCache = OrderedDict()
+
+        # Least recently used images are evicted when the total size
+        # of the cached images goes over maxCacheSize
+        self._imageCache = ImageCache(self._maxCacheSize,
+                                      onEvict=self._onEvict)
+        # Evicted images are kept compressed in a second tier (default
+        # 50 Mb of compressed data), so going back to recently seen images
+        # does not require reading the files. Use 0 to disable it.
+        if maxColdCacheSize > 0:
+            self._coldCache = CompressedCache(
+                maxColdCacheSize * 1024 * 1024, method=coldCompression)
+        else:
+            self._coldCache = None
+        # If sharedCache is True, images are kept in shared memory instead,
+        # so other processes can use them (see SharedImageCache)
+        if sharedCache:
+            self._sharedCache = SharedImageCache(self._maxCacheSize)
+        else:
+            self._sharedCache = None
+        # Optionally, getData results are cached converted to a smaller
+        # type ('float16' or 'uint8', see reduceData), e.g. for galleries
+        # where the data is only used for display
+        if cacheType not in (None, 'float16', 'uint8'):
+            raise Exception("Invalid cacheType: %s" % cacheType)
+        self._cacheType = cacheType
+        # Downsampled images (see getThumbnail) are kept in a separated
+        # cache, with its own size limit (default 20 Mb)
+        self._thumbnailCache = ImageCache(maxThumbnailCacheSize * 1024 * 1024)
+        # Optionally, thumbnails are also stored on disk so they can be
+        # reused in other sessions (default limit 500 Mb)
+        if thumbnailDir is None:
+            self._thumbnailDiskCache = None
+        else:
+            self._thumbnailDiskCache = DiskCache(
+                thumbnailDir, maxThumbnailDirSize * 1024 * 1024)
+
+        # Cache keys pinned for each (path, index, slice), so unpin releases
+        # the same keys even if the file changed meanwhile
+        self._pins = dict()
+        # (id, data) of the last volume read by getSlice that did not fit
+        # in the cache
+        self._lastVolume = None
+
+        # Background loading of images (see prefetch). Pending tasks are
+        # kept in a heap, so the ones with higher priority are loaded first
+        self._maxWorkers = maxWorkers
+        self._executor = None
+        self._prefetchQueue = []
+        self._prefetchTasks = dict()
+        self._prefetchSeq = itertools.count()
+
+        # Sequential or strided access to the images of a file is detected
+        # in getData, and the next images are loaded in background (see
+        # _readAhead). Up to maxReadAhead images are read in advance, using
+        # the average read time (seconds) to adapt it. 0 disables it.
+        self._maxReadAhead = maxReadAhead
+        self._accessPatterns = OrderedDict()
+        self._readTime = 0.0
+
+        # Counters and read latencies (see getStats)
+        self._stats = IOStats()
+
+    def _getId(self, imageRef):
+        """ Create a unique image id for the given image reference:
+        (device, inode, modification time, size, index) of the file. So the
+        same file reached through different paths (relative, absolute or
+        symbolic links) has the same ids, and the images of a file that has
+        changed are not taken from the cache.
+        If the file can not be accessed, the id is 'index@path'.
+        """
+        st = self._stat(imageRef.path)
+        if st is None:
+            return '%d@%s' % (imageRef.index, imageRef.path)
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size,
+                imageRef.index)
+
+    def _stat(self, path):
+        """ Return the os.stat result for the file of the given path (that
+        might include the ':format' suffix), or None if it can not be
+        accessed. Results are reused during STAT_TTL seconds. When a change
+        in the file is detected, it is closed (and unmapped), so it will be
+        opened again when needed.
+        """
+        now = time.time()
+        with self._lock:
+            item = self._statCache.get(path, None)
+            if item is not None and now - item[0] < STAT_TTL:
+                return item[1]
+
+        try:
+            st = os.stat(path.split(':')[0])
+        except OSError:
+            st = None
 
-        # FIXME: Control the max size of the Cache (no limited now)
-        # TODO: Maybe check LRUCache implementation here:
-        # https://www.kunxi.org/2014/05/lru-cache-in-python/
-        self._imageCache = {}
+        with self._lock:
+            if item is not None and item[1] is not None and (
+                    st is None or self._getVersion(st) !=
+                    self._getVersion(item[1])):
+                self._closeFile(path)
+            self._statCache.pop(path, None)
+            self._statCache[path] = (now, st)
+            while len(self._statCache) > HEADER_CACHE_SIZE:
+                self._statCache.popitem(last=False)
+        return st
+
+    @classmethod
+    def _getVersion(cls, st):
+        """ Values of the os.stat result that change with the file. """
+        return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
 
-        # Just for debugging purposes
-        self._readCount = 0
-        self._cacheSize = 0
+    def _getCacheKey(self, imageRef):
+        """ Return the key used to store the data returned by getData. """
+        imgId = self._getId(imageRef)
+        if self._cacheType is None:
+            return imgId
+        return imgId, self._cacheType
+
+    @classmethod
+    def getDefault(cls):
+        """ Return the process-wide ImageManager, used by the models when
+        no ImageManager is provided, so all of them share the same cache
+        and open files. It is created with the default settings the first
+        time it is requested, unless setDefault was called before.
+        """
+        with cls._defaultLock:
+            if cls._default is None:
+                cls._default = ImageManager()
+            return cls._default
 
-    # TODO: Review if it is better to use strings for indexes rather than tuple
     @classmethod
-    def _getId(cls, imageRef):
-        """ Create a unique image id for the given image reference. """
-        return '%d@%s' % (imageRef.index, imageRef.path)
+    def setDefault(cls, imageManager=None, **kwargs):
+        """ Replace the process-wide ImageManager (see getDefault). The
+        previous one is closed, models using it will still work but files
+        will be opened again.
+
+        Args:
+            imageManager: The new default ImageManager. If None, a new one
+                will be created with the given keyword arguments (e.g.
+                maxCacheSize to set the global cache budget).
+
+        Returns:
+            The new default ImageManager.
+        """
+        if imageManager is None:
+            imageManager = ImageManager(**kwargs)
+        with cls._defaultLock:
+            old, cls._default = cls._default, imageManager
+        if old is not None and old is not imageManager:
+            old.close()
+        return imageManager
 
     @classmethod
     def findImagePrefix(cls, imageSource, rootPath):
@@ -65,26 +288,65 @@ class ImageManager:
             was found from where the imagePath exists. It should be noted
             that empty prefix means that imagePath already exists and
             there is no need to prepend any value.
+
+        Results are memoized for the directory of the image path, so other
+        images in the same directory will get the same prefix without
+        accessing the file system (see clearPrefixCache).
         """
-        imgRef = cls.getRef(imageSource)
-        imgPath = imgRef.path
-        if ':' in imgPath:
-            imgPath = imgPath.split(':')[0]
+        return cls.findImagePrefixes([imageSource], rootPath)[0]
 
-        if os.path.exists(imgPath):
-            return ''  # There is no need for any prefix
+    @classmethod
+    def findImagePrefixes(cls, imageSources, rootPath):
+        """ Same as findImagePrefix, but for a list of image sources (e.g.
+        all values of an image column). Image paths are grouped by
+        directory, and the directories not found in the cache are searched
+        together in a single walk up from rootPath.
 
-        if os.path.isdir(rootPath):
-            searchPath = rootPath
-        else:
-            searchPath = os.path.dirname(rootPath)
+        Returns:
+            The list of prefixes (str or None) for each image source.
+        """
+        cwd = os.getcwd()
+        keys = []
+        missing = dict()  # Image path to check for each missing key
+
+        for imgSource in imageSources:
+            imgPath = cls.getRef(imgSource).path.split(':')[0]
+            key = (cwd, rootPath, os.path.dirname(imgPath))
+            keys.append(key)
+            if key not in cls._prefixCache and key not in missing:
+                missing[key] = imgPath
+
+        if missing:
+            found = dict()
+            for key, imgPath in list(missing.items()):
+                if os.path.exists(imgPath):
+                    found[key] = ''  # There is no need for any prefix
+                    del missing[key]
+
+            if not missing or not rootPath:
+                searchPath = None  # Nothing to search or nowhere to search
+            elif os.path.isdir(rootPath):
+                searchPath = rootPath
+            else:
+                searchPath = os.path.dirname(rootPath)
 
-        while searchPath and searchPath != '/':
-            if os.path.exists(os.path.join(searchPath, imgPath)):
-                return searchPath
-            searchPath = os.path.dirname(searchPath)
+            while missing and searchPath and searchPath != '/':
+                for key, imgPath in list(missing.items()):
+                    if os.path.exists(os.path.join(searchPath, imgPath)):
+                        found[key] = searchPath
+                        del missing[key]
+                searchPath = os.path.dirname(searchPath)
 
-        return None
+            for key in missing:
+                found[key] = None
+            cls._prefixCache.update(found)
+
+        return [cls._prefixCache[key] for key in keys]
+
+    @classmethod
+    def clearPrefixCache(cls):
+        """ Forget the results of previous findImagePrefix calls. """
+        cls._prefixCache.clear()
 
     @classmethod
     def getRef(cls, imgSource):
@@ -98,22 +360,210 @@ class ImageManager:
 
         raise Exception('Can not get ImageRef from type %s' % type(imgSource))
 
+    @contextmanager
     def _openRO(self, imgSource):
         """ Open image source as read-only.
-        Return the imageRef and the imageIO.
+        This is a context manager that yields the imageRef and the imageIO,
+        holding the lock of the open file while it is in use. e.g:
+
+            with self._openRO(imgSource) as (imgRef, imgIO):
+                imgIO.read(imgRef.index, img)
         """
         imgRef = self.getRef(imgSource)
         imgPath = imgRef.path
-        imgFormat = ''  # By default inferred from path
-        # Let's keep open the file if possible, so we don't need
-        # to re-open if in the next use it is the same file
-        if self._lastOpenedFile != imgPath:
-            self._imgIO.close()
+
+        with self._lock:
+            openFile = self._openFiles.get(imgPath, None)
+            if openFile is not None:
+                self._stats.count('file_reuses')
+                self._openFiles.move_to_end(imgPath)
+                openFile.users += 1
+
+        if openFile is None:
+            # Open the file without holding the lock, so other threads
+            # can still use the files that are already open
+            imgFormat = ''  # By default inferred from path
             if ':' in imgPath:
                 imgPath, imgFormat = imgPath.split(':')
-            self._imgIO.open(imgPath, emc.File.READ_ONLY, imgFormat)
-            self._lastOpenedFile = imgRef.path
-        return imgRef, self._imgIO
+            imgIO = emc.ImageFile()
+            imgIO.open(imgPath, emc.File.READ_ONLY, imgFormat)
+
+            with self._lock:
+                openFile = self._openFiles.get(imgRef.path, None)
+                if openFile is None:
+                    self._stats.count('file_opens')
+                    openFile = _OpenFile(imgIO)
+                    self._openFiles[imgRef.path] = openFile
+                    self._closeExtraFiles()
+                else:  # Other thread opened the same file meanwhile
+                    self._stats.count('file_reuses')
+                    imgIO.close()
+                openFile.users += 1
+
+        try:
+            with openFile.lock:
+                yield imgRef, openFile.imgIO
+        finally:
+            with self._lock:
+                openFile.users -= 1
+                if openFile.evicted and openFile.users == 0:
+                    openFile.imgIO.close()
+
+    def _closeExtraFiles(self, maxOpenFiles=None):
+        """ Close the least recently used files until there are no more
+        than maxOpenFiles. Files that are being used will be closed
+        when the last reader releases them.
+        This method should be called with the lock acquired.
+        """
+        if maxOpenFiles is None:
+            maxOpenFiles = max(self._maxOpenFiles, 1)
+
+        while len(self._openFiles) > maxOpenFiles:
+            _, openFile = self._openFiles.popitem(last=False)
+            openFile.evicted = True
+            if openFile.users == 0:
+                openFile.imgIO.close()
+
+    def _closeFile(self, path):
+        """ Close the file (if open) and remove its memory map.
+        This method should be called with the lock acquired.
+        """
+        openFile = self._openFiles.pop(path, None)
+        if openFile is not None:
+            openFile.evicted = True
+            if openFile.users == 0:
+                openFile.imgIO.close()
+        self._mrcFiles.pop(path, None)
+
+    def _getMrcFile(self, path, force=False):
+        """ Return the MrcFile to read the data from the given path, or
+        None if the file can not be mapped. If force is False, None is also
+        returned when useMmap is False.
+        """
+        if (not (self._useMmap or force) or ':' in path
+                or not MrcFile.isMrc(path)):
+            return None
+
+        self._stat(path)  # Drop the map if the file has changed
+        with self._lock:
+            if path in self._mrcFiles:
+                self._mrcFiles.move_to_end(path)
+                return self._mrcFiles[path]
+
+        try:
+            mrcFile = MrcFile(path, dim=self.getDim(path))
+        except Exception:
+            mrcFile = None
+
+        with self._lock:
+            self._mrcFiles[path] = mrcFile
+            while len(self._mrcFiles) > max(self._maxOpenFiles, 1):
+                self._mrcFiles.popitem(last=False)
+
+        return mrcFile
+
+    def close(self):
+        """ Close all the image files that are kept open and cancel
+        the pending prefetch tasks.
+        """
+        self.cancel()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self._closeExtraFiles(0)
+            self._mrcFiles.clear()
+
+    def _read(self, imgIO, imgRef, index, img):
+        """ Read the image at index from the open imgIO, registering
+        the time it takes in the stats.
+        """
+        t = time.time()
+        imgIO.read(index, img)
+        t = time.time() - t
+        self._stats.addRead(imgRef.path, t)
+        self._readTime = 0.8 * self._readTime + 0.2 * t
+
+    def getStats(self):
+        """ Return a snapshot of the ImageManager statistics, a dict with:
+        'cache': hits, misses, evictions, items, pinned items and bytes of
+            the image cache
+        'thumbnails': same values for the thumbnails cache
+        'cold': same values for the compressed tier (if enabled), plus the
+            uncompressed size of its images ('raw_bytes')
+        'files': number of 'open' files and the counters of file 'opens'
+            and 'reuses' of already open files
+        'reads': number of images read, total 'read_time' (seconds) and
+            number of images requested by the 'read_ahead'
+        'latency_by_file', 'latency_by_format': read latency histograms
+            (see IOStats.LATENCY_BINS)
+        Two snapshots can be compared with ImageManager.diffStats.
+        """
+        snapshot = self._stats.snapshot()
+        counters = snapshot['counters']
+        with self._lock:
+            openFiles = len(self._openFiles)
+
+        stats = {
+            'cache': self._imageCache.getStats(),
+            'thumbnails': self._thumbnailCache.getStats(),
+            'files': {
+                'open': openFiles,
+                'opens': counters.get('file_opens', 0),
+                'reuses': counters.get('file_reuses', 0)
+            },
+            'reads': {
+                'count': counters.get('reads', 0),
+                'read_time': counters.get('read_time', 0),
+                'read_ahead': counters.get('read_ahead', 0)
+            },
+            'latency_by_file': snapshot['latency_by_file'],
+            'latency_by_format': snapshot['latency_by_format']
+        }
+        if self._coldCache is not None:
+            stats['cold'] = self._coldCache.getStats()
+        if self._sharedCache is not None:
+            stats['shared'] = self._sharedCache.getStats()
+        return stats
+
+    def resetStats(self):
+        """ Set all the counters and histograms to zero. """
+        self._stats.reset()
+        self._imageCache.resetStats()
+        self._thumbnailCache.resetStats()
+        if self._coldCache is not None:
+            self._coldCache.resetStats()
+        if self._sharedCache is not None:
+            self._sharedCache.resetStats()
+
+    @classmethod
+    def diffStats(cls, before, after):
+        """ Return the difference between two snapshots from getStats,
+        e.g. to measure what happened during some operation.
+        """
+        return IOStats.diff(before, after)
+
+    def _onEvict(self, key, value):
+        """ Store the images evicted from the cache in the cold tier.
+        Images larger than the whole cold tier are just dropped.
+        """
+        if self._coldCache is not None:
+            data = self._toArray(value)
+            if data.nbytes <= self._coldCache.getMaxSize():
+                self._coldCache.put(key, data)
+
+    def _getCached(self, key):
+        """ Return the value stored in the cache for the key, or None.
+        Data found in the cold tier is decompressed and moved back to the
+        cache as a numpy array.
+        """
+        value = self._imageCache.get(key, None)
+        if value is None and self._coldCache is not None:
+            value = self._coldCache.get(key)
+            if value is not None:
+                self._coldCache.remove(key)
+                self._imageCache.put(key, value, value.nbytes)
+        return value
 
     def getImage(self, imgSource, copy=False):
         """ Retrieve the image (from cache or from file) from the
@@ -126,31 +576,678 @@ class ImageManager:
         """
         imgRef = self.getRef(imgSource)
         imgId = self._getId(imgRef)
+        # The cold tier (and data restored from it) only keeps numpy
+        # arrays, so emc.Image objects are only taken from the cache
         imgOut = self._imageCache.get(imgId, None)
-        if imgOut is None:
-            imgRef, imgIO = self._openRO(imgSource)
-            # Create a new image if a copy is requested
-            # TODO: Review this when the cache is implemented
-            imgOut = emc.Image()
-            self._readCount += 1
-            imgIO.read(imgRef.index, imgOut)
-            self._imageCache[imgId] = imgOut
-            self._cacheSize += imgOut.getDataSize()
-            if copy:
-                imgOut = emc.Image(imgOut)
+        if imgOut is None or isinstance(imgOut, np.ndarray):
+            imgOut = self._loadImage(imgRef, imgId)
+        if copy:
+            imgOut = emc.Image(imgOut)
         return imgOut
 
+    def _loadImage(self, imgRef, imgId):
+        """ Read the image from the file and store it in the cache. """
+        img = emc.Image()
+        with self._openRO(imgRef) as (imgRef, imgIO):
+            self._read(imgIO, imgRef, imgRef.index, img)
+        if self._coldCache is not None:
+            self._coldCache.remove(imgId)
+        self._imageCache.put(imgId, img, img.getDataSize())
+        return img
+
     def getData(self, imgSource, copy=False):
-        """ Similar to getImage, but return a numpy array instead. """
-        img = self.getImage(imgSource, copy=False)
-        return np.array(img, copy=copy, dtype=EmType.toNumpy(img.getType()))
+        """ Similar to getImage, but return a numpy array instead.
+        If useMmap is True, the data of MRC files is returned as a read-only
+        view of the mapped file (unless a copy is requested). Likewise, if
+        sharedCache is True, a read-only view of the shared memory segment
+        is returned.
+        The array has the same type as the image in the file, unless a
+        cacheType was set, in which case the data is converted to that
+        type (except for mapped MRC files).
+        Sequential access to the images of a file triggers the background
+        load of the next ones (see maxReadAhead).
+        """
+        imgRef = self.getRef(imgSource)
+        if self._maxReadAhead > 0 and imgRef.slice == 0:
+            # Wait for the image if it is already being read in background
+            with self._lock:
+                task = self._prefetchTasks.get(self._getId(imgRef), None)
+            if task is not None and task.started:
+                task.future.exception()
+            data = self._getData(imgRef, copy)
+            self._readAhead(imgRef, data.nbytes)
+            return data
+        return self._getData(imgRef, copy)
+
+    def _getData(self, imgRef, copy=False):
+        """ Return the data of the image (see getData), without read-ahead.
+        """
+        if imgRef.slice > 0:
+            return self.getSlice(imgRef, copy=copy)
+
+        mrcFile = self._getMrcFile(imgRef.path)
+        if mrcFile is not None:
+            data = mrcFile.getData(imgRef.index)
+            return np.array(data) if copy else data
+
+        fileKey = None
+        if self._sharedCache is not None:
+            fileKey = self._getFileKey(imgRef)
+        if fileKey is not None:
+            if self._cacheType is not None:
+                fileKey += (self._cacheType,)
+            data = self._sharedCache.get(fileKey)
+            if data is None:
+                data = self._sharedCache.put(fileKey,
+                                             self._readReduced(imgRef))
+            return np.array(data) if copy else data
+
+        key = self._getCacheKey(imgRef)
+        data = self._getCached(key)
+        if data is not None:
+            return self._toArray(data, copy)
+
+        if self._cacheType is None:
+            return self._toArray(self._loadImage(imgRef, key), copy)
+
+        data = self._readReduced(imgRef)
+        self._imageCache.put(key, data, data.nbytes)
+        return np.array(data) if copy else data
+
+    def _readReduced(self, imgRef):
+        """ Read the data of the image converted to the cacheType. """
+        data = self._readData(imgRef)
+        if self._cacheType is None:
+            return data
+        return reduceData(data, self._cacheType)
+
+    def getSlice(self, imgSource, slice=None, axis=None, copy=False):
+        """ Return a single plane of a volume as a 2D numpy array.
+        For MRC files, the plane is read from a memory map of the file, so
+        the rest of the volume is not loaded. For other formats, the whole
+        volume is read once and the plane is copied from it. The volume is
+        cached (see getData) if it fits in the cache, otherwise only the
+        last volume read is kept (up to LAST_VOLUME_SIZE bytes).
+
+        Args:
+            imgSource: Either ImageRef or path
+            slice: (int) Slice number starting at 1. If None, the slice
+                from the ImageRef will be used.
+            axis: (int) X_AXIS, Y_AXIS or Z_AXIS. If None, the axis from
+                the ImageRef will be used.
+            copy: If True, the returned array is a copy. Otherwise it might
+                be a read-only view of the mapped file.
+        """
+        imgRef = self.getRef(imgSource)
+        slice = imgRef.slice if slice is None else slice
+        axis = imgRef.axis if axis is None else axis
+        volRef = ImageRef(imgRef.path, imgRef.index)
+
+        mrcFile = self._getMrcFile(imgRef.path, force=True)
+        if mrcFile is not None:
+            data = mrcFile.getData(volRef.index)
+        else:
+            data = self._getVolume(volRef)
+            copy = True  # Do not keep a reference to the whole volume
+
+        if data.ndim == 2:
+            data = data[np.newaxis]
+
+        n = data.shape[2 - axis]
+        if not 1 <= slice <= n:
+            raise Exception("Slice should be between 1 and %d, value is %d"
+                            % (n, slice))
+
+        if axis == Z_AXIS:
+            plane = data[slice - 1]
+        elif axis == Y_AXIS:
+            plane = data[:, slice - 1, :]
+        elif axis == X_AXIS:
+            plane = data[:, :, slice - 1]
+        else:
+            raise Exception("Invalid axis value: %s" % axis)
+
+        return np.array(plane) if copy else plane
+
+    def _getVolume(self, volRef):
+        """ Return the data of the whole volume for getSlice. Volumes that
+        fit in the cache are read with getData, bigger ones are read without
+        evicting the cached images and kept in _lastVolume (if they are not
+        bigger than LAST_VOLUME_SIZE).
+        """
+        x, y, z, _ = self.getDim(volRef)
+        dataType = self.getInfo(volRef)['data_type']
+        size = x * y * z * np.dtype(EmType.toNumpy(dataType)).itemsize
+        if size <= self._imageCache.getMaxSize():
+            return self._getData(volRef)
+
+        imgId = self._getId(volRef)
+        with self._lock:
+            lastVolume = self._lastVolume
+        if lastVolume is not None and lastVolume[0] == imgId:
+            return lastVolume[1]
+
+        data = self._readData(volRef)
+        with self._lock:
+            if size <= LAST_VOLUME_SIZE:
+                self._lastVolume = (imgId, data)
+            else:
+                self._lastVolume = None
+        return data
+
+    def getRegion(self, imgSource, x, y, w, h, binning=1):
+        """ Return a rectangular region of a 2D image, optionally binned.
+        For MRC files, only the requested region is read from a memory map
+        of the file. For other formats the whole image is read (and cached)
+        and the region is copied from it.
+
+        Args:
+            imgSource: Either ImageRef or path
+            x, y: (int) Top-left corner of the region (in pixels of the
+                full image).
+            w, h: (int) Width and height of the region. The region is
+                clipped to the image boundaries.
+            binning: (int) If greater than 1, the region is binned by this
+                factor (see binData).
+
+        Returns:
+            A new 2D numpy array with shape (h // binning, w // binning).
+        """
+        imgRef = self.getRef(imgSource)
+        mrcFile = self._getMrcFile(imgRef.path, force=True)
+        if mrcFile is not None:
+            data = mrcFile.getData(imgRef.index)
+        else:
+            data = self.getData(imgRef)
+
+        if data.ndim != 2:
+            raise Exception("Regions can only be read from 2D images, "
+                            "image dimensions: %s" % (data.shape,))
+
+        height, width = data.shape
+        region = data[max(y, 0):min(y + h, height),
+                      max(x, 0):min(x + w, width)]
+
+        if binning > 1:
+            return binData(region, binning)
+        return np.array(region)
+
+    def _readData(self, imgRef):
+        """ Return the data of the image, either from the cache or from
+        the file. Unlike getData, new images are not stored in the cache.
+        """
+        mrcFile = self._getMrcFile(imgRef.path)
+        if mrcFile is not None:
+            return mrcFile.getData(imgRef.index)
+
+        img = self._getCached(self._getId(imgRef))
+        if img is None:
+            img = emc.Image()
+            with self._openRO(imgRef) as (imgRef, imgIO):
+                self._read(imgIO, imgRef, imgRef.index, img)
+        return self._toArray(img)
+
+    @classmethod
+    def _toArray(cls, img, copy=False):
+        """ Return a numpy array with the data of the image and the same
+        type (see EmType.toNumpy). Unless copy is True, the array is a view
+        of the image buffer and no data is copied.
+        Arrays (e.g. from the cold tier) are returned as they are.
+        """
+        if isinstance(img, np.ndarray):
+            return np.array(img) if copy else img
+        dtype = EmType.toNumpy(img.getType())
+        if copy:
+            return np.array(img, dtype=dtype, copy=True)
+        return np.asarray(img, dtype=dtype)
+
+    def getThumbnail(self, imgSource, maxSize):
+        """ Return a downsampled version of the image, for example to be
+        displayed in a gallery cell. Thumbnails are computed by binning the
+        image by powers of 2, and several levels are stored in a separated
+        cache, so the full image is not kept in memory. If a thumbnailDir
+        was provided, thumbnails are also stored there and reused while
+        the image file does not change.
+        For volumes, the thumbnail is computed from the central slice.
+
+        Args:
+            imgSource: Either ImageRef or path
+            maxSize: (int) Size (in pixels) at which the thumbnail will be
+                displayed. The returned level is the smallest one whose
+                larger dimension is not under maxSize (if the image is
+                big enough).
+
+        Returns:
+            A 2D numpy array (float32 if the image was downsampled).
+        """
+        if maxSize < 1:
+            raise Exception("Invalid thumbnail size: %s" % maxSize)
+
+        imgRef = self.getRef(imgSource)
+        imgId = self._getId(imgRef)
+        x, y, _, _ = self.getDim(imgRef)
+
+        size, level = max(x, y), 0
+        while size // 2 >= maxSize:
+            size //= 2
+            level += 1
+
+        thumb = self._thumbnailCache.get((imgId, level), None)
+        if thumb is not None:
+            return thumb
+
+        diskKey = None
+        if self._thumbnailDiskCache is not None:
+            diskKey = self._getFileKey(imgRef)
+        if diskKey is not None:
+            thumb = self._thumbnailDiskCache.get(diskKey + (level,))
+            if thumb is not None:
+                self._thumbnailCache.put((imgId, level), thumb, thumb.nbytes)
+                return thumb
+
+        data = self._readData(imgRef)
+        if data.ndim > 2:  # Take the central slice of volumes
+            data = data[data.shape[0] // 2]
+        data = binData(data, 2 ** level)
+        thumb = data
+        # Store the requested level and the smaller ones
+        while True:
+            self._thumbnailCache.put((imgId, level), data, data.nbytes)
+            if diskKey is not None:
+                self._thumbnailDiskCache.put(diskKey + (level,), data)
+            if max(data.shape) // 2 < THUMBNAIL_MIN_SIZE:
+                break
+            data = binData(data, 2)
+            level += 1
+
+        return thumb
+
+    def _getFileKey(self, imgRef):
+        """ Return a key that identifies the image across processes and
+        sessions: absolute path, modification time, size and index of the
+        file. Used for the thumbnails on disk and the shared memory cache.
+        Return None if the file can not be accessed.
+        """
+        st = self._stat(imgRef.path)
+        if st is None:
+            return None
+        return (os.path.abspath(imgRef.path.split(':')[0]), st.st_mtime_ns,
+                st.st_size, imgRef.index)
+
+    def getDataBatch(self, refs):
+        """ Read the images from several sources into a single numpy
+        array. Sources are grouped by file and sorted by index, so each
+        file is opened (and locked) only once and read in order.
+        Images found in the cache are copied from there, and the new ones
+        are read without being stored in the cache.
+
+        Args:
+            refs: List of image sources (either ImageRef or path). All of
+                them should have the same dimensions.
+
+        Returns:
+            A numpy array where the first dimension is the position of the
+            image in the input list, or None if the list was empty.
+        """
+        groups = OrderedDict()
+        for i, imgSource in enumerate(refs):
+            imgRef = self.getRef(imgSource)
+            groups.setdefault(imgRef.path, []).append((imgRef.index, i))
+
+        n = len(refs)
+        out = None
+        img = emc.Image()
+
+        for path, items in groups.items():
+            items.sort()
+            mrcFile = self._getMrcFile(path)
+            if mrcFile is not None:
+                out = self._fillBatchMrc(out, n, mrcFile, items)
+                continue
+
+            missing = []
+            for index, i in items:
+                imgId = self._getId(ImageRef(path, index))
+                cached = self._getCached(imgId)
+                if cached is None:
+                    missing.append((index, i))
+                else:
+                    out = self._fillBatch(out, n, i, cached)
+
+            if missing:
+                with self._openRO(path) as (imgRef, imgIO):
+                    for index, i in missing:
+                        self._read(imgIO, imgRef, index, img)
+                        out = self._fillBatch(out, n, i, img)
+
+        return out
+
+    @classmethod
+    def _fillBatch(cls, out, n, i, img):
+        """ Copy the data of the image in the position i of the batch.
+        The output array is created (if None) from the first image.
+        """
+        data = cls._toArray(img)
+        if out is None:
+            out = np.empty((n,) + data.shape, dtype=data.dtype)
+        elif out.shape[1:] != data.shape:
+            raise Exception("Images with different dimensions in batch: "
+                            "%s and %s" % (out.shape[1:], data.shape))
+        np.copyto(out[i], data)
+        return out
+
+    @classmethod
+    def _fillBatchMrc(cls, out, n, mrcFile, items):
+        """ Copy the images from the mapped file to their positions in the
+        batch. Items are (index, position) pairs sorted by index, so runs
+        of consecutive indexes are copied with a single slice.
+        """
+        array = mrcFile.getArray()
+        x, y, z, _ = mrcFile.getDim()
+        shape = (y, x) if z == 1 else (z, y, x)
+        if out is None:
+            out = np.empty((n,) + shape, dtype=array.dtype.newbyteorder('='))
+        elif out.shape[1:] != shape:
+            raise Exception("Images with different dimensions in batch: "
+                            "%s and %s" % (out.shape[1:], shape))
+
+        indexes = [max(index, 1) - 1 for index, _ in items]
+        start = 0
+        while start < len(items):
+            end = start + 1
+            while end < len(items) and indexes[end] == indexes[end - 1] + 1:
+                end += 1
+            run = array[indexes[start]:indexes[end - 1] + 1]
+            positions = [i for _, i in items[start:end]]
+            out[positions] = run.reshape((end - start,) + shape)
+            start = end
+
+        return out
+
+    def prefetch(self, refs, priority=0, thumbnailSize=None):
+        """ Load the images from the given sources into the cache using
+        a pool of background threads.
+
+        Args:
+            refs: Iterable of image sources (either ImageRef or path)
+            priority: (int) Tasks with higher priority are loaded first.
+                Prefetching again a pending image with a higher priority
+                will raise the priority of its task.
+            thumbnailSize: (int) If provided, thumbnails of this size are
+                loaded instead of the full images (see getThumbnail).
+            Requests of the same image share the same task (and future),
+            which is only cancelled by ImageManager.cancel after all of them
+            have been cancelled.
+
+        Returns:
+            A list of concurrent.futures.Future (one for each input ref),
+            the result of each future is the numpy array of the image
+            (or thumbnail).
+            Pending futures can be cancelled either with their cancel
+            method or with ImageManager.cancel.
+        """
+        futures = []
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(self._maxWorkers, 1),
+                    thread_name_prefix='ImageManager')
+
+            for imgSource in refs:
+                imgRef = self.getRef(imgSource)
+                taskId = self._getTaskId(imgRef, thumbnailSize)
+                task = self._prefetchTasks.get(taskId, None)
+
+                if task is None or task.future.done():
+                    task = _PrefetchTask(imgRef, priority, thumbnailSize)
+                    self._prefetchTasks[taskId] = task
+                elif priority > task.priority:
+                    # Push it again with the new priority, the old entry
+                    # will be skipped when it is taken from the queue
+                    task.priority = priority
+                else:
+                    task.requests += 1
+                    futures.append(task.future)
+                    continue
+                task.requests += 1
+
+                heapq.heappush(self._prefetchQueue,
+                               (-priority, next(self._prefetchSeq), task))
+                self._executor.submit(self._runPrefetch)
+                futures.append(task.future)
+
+        return futures
+
+    def _getTaskId(self, imgRef, thumbnailSize=None):
+        """ Return the key of the prefetch task for the image. """
+        imgId = self._getId(imgRef)
+        return imgId if thumbnailSize is None else (imgId, thumbnailSize)
+
+    def cancel(self, refs=None, thumbnailSize=None):
+        """ Cancel pending prefetch tasks. Images that are already being
+        loaded will not be cancelled.
+
+        Args:
+            refs: Iterable of image sources (either ImageRef or path) whose
+                requests should be cancelled. Tasks requested several times
+                (see prefetch) are only cancelled when all their requests
+                are cancelled. If None, all pending tasks will be
+                cancelled.
+            thumbnailSize: (int) The thumbnail size used in prefetch, if
+                the tasks were created for thumbnails.
+
+        Returns:
+            The number of tasks that were cancelled.
+        """
+        with self._lock:
+            if refs is None:
+                taskIds = list(self._prefetchTasks.keys())
+            else:
+                taskIds = [self._getTaskId(self.getRef(r), thumbnailSize)
+                           for r in refs]
+
+            count = 0
+            for taskId in taskIds:
+                task = self._prefetchTasks.get(taskId, None)
+                if task is None:
+                    continue
+                if refs is not None:
+                    task.requests -= 1
+                    if task.requests > 0:  # Still requested by others
+                        continue
+                # Removed before cancelling, since the callbacks of the
+                # future may request the same image again
+                del self._prefetchTasks[taskId]
+                if task.future.cancel():
+                    count += 1
+                else:  # Already being loaded
+                    self._prefetchTasks.setdefault(taskId, task)
+
+            if not self._prefetchTasks:
+                self._prefetchQueue = []
+
+        return count
+
+    def _runPrefetch(self):
+        """ Load the pending task with the highest priority.
+        This function is executed in the threads of the executor.
+        """
+        with self._lock:
+            task = None
+            while self._prefetchQueue and task is None:
+                negPriority, _, task = heapq.heappop(self._prefetchQueue)
+                # Skip outdated entries and cancelled tasks
+                if (task.started or -negPriority != task.priority
+                        or not task.future.set_running_or_notify_cancel()):
+                    task = None
+            if task is None:
+                return
+            task.started = True
+
+        try:
+            if task.thumbnailSize is None:
+                data = self._getData(task.imgRef)
+            else:
+                data = self.getThumbnail(task.imgRef, task.thumbnailSize)
+            task.future.set_result(data)
+        except Exception as e:
+            task.future.set_exception(e)
+        finally:
+            with self._lock:
+                taskId = self._getTaskId(task.imgRef, task.thumbnailSize)
+                if self._prefetchTasks.get(taskId, None) is task:
+                    del self._prefetchTasks[taskId]
+
+    def _readAhead(self, imgRef, nbytes):
+        """ Register the access to the image and, if the last accesses to
+        its file were sequential (or with a constant stride), prefetch the
+        next images. The number of images read ahead is enough to cover the
+        average read time at the observed access rate, and it is limited by
+        maxReadAhead and a quarter of the cache size.
+        Mapped MRC files are skipped, the operating system already reads
+        them ahead.
+        """
+        if self._getMrcFile(imgRef.path) is not None:
+            return
+
+        now = time.time()
+        index = max(imgRef.index, 1)
+        with self._lock:
+            pattern = self._accessPatterns.pop(imgRef.path, None)
+            if pattern is None:
+                pattern = _AccessPattern(index, now)
+            elif index != pattern.index:
+                stride = index - pattern.index
+                if stride == pattern.stride:
+                    pattern.count += 1
+                    interval = now - pattern.time
+                    if pattern.interval is None:
+                        pattern.interval = interval
+                    else:
+                        pattern.interval = (0.7 * pattern.interval
+                                            + 0.3 * interval)
+                else:
+                    pattern.stride = stride
+                    pattern.count = 0
+                    pattern.interval = None
+                    pattern.ahead = index
+                pattern.index = index
+                pattern.time = now
+            self._accessPatterns[imgRef.path] = pattern
+            while len(self._accessPatterns) > ACCESS_PATTERNS_SIZE:
+                self._accessPatterns.popitem(last=False)
+
+            # At least three accesses with the same stride
+            if pattern.count < 2:
+                return
+
+            k = self._maxReadAhead
+            if pattern.interval > 0:
+                k = min(k, int(math.ceil(self._readTime /
+                                         pattern.interval)) + 1)
+            budget = int(self._maxCacheSize // (4 * max(nbytes, 1)))
+            k = min(k, max(budget, 1))
+            stride = pattern.stride
+            # Number of images ahead of this one already requested
+            done = max((pattern.ahead - index) // stride, 0)
+            if k <= done:
+                return
+            pattern.ahead = index + k * stride
+
+        n = self.getDim(imgRef)[3]
+        refs = [ImageRef(imgRef.path, i) for i in
+                range(index + (done + 1) * stride, index + (k + 1) * stride,
+                      stride) if 1 <= i <= n]
+        if refs:
+            self._stats.count('read_ahead', len(refs))
+            self.prefetch(refs, priority=-1)
+
+    def pin(self, imgSource):
+        """ Prevent the image from the given source to be evicted from the
+        cache, for example while it is being displayed. Each call should be
+        balanced with a call to unpin.
+        Return the pinned cache key.
+        """
+        imgRef = self.getRef(imgSource)
+        key = self._getCacheKey(imgRef)
+        with self._lock:
+            pinId = imgRef.path, imgRef.index, imgRef.slice
+            self._pins.setdefault(pinId, []).append(key)
+        self._imageCache.pin(key)
+        return key
+
+    def unpin(self, imgSource):
+        """ Allow again the eviction of the image from the given source.
+        The key pinned by the last call to pin is released, even if the
+        file has changed since then.
+        """
+        imgRef = self.getRef(imgSource)
+        pinId = imgRef.path, imgRef.index, imgRef.slice
+        with self._lock:
+            keys = self._pins.get(pinId, None)
+            if not keys:
+                return
+            key = keys.pop()
+            if not keys:
+                del self._pins[pinId]
+        self._imageCache.unpin(key)
+
+    def clearCache(self):
+        """ Remove all images and thumbnails from the cache. """
+        self._imageCache.clear()
+        with self._lock:
+            self._pins.clear()  # Pins are also released by the cache
+            self._lastVolume = None
+        if self._coldCache is not None:
+            self._coldCache.clear()
+        self._thumbnailCache.clear()
+        if self._sharedCache is not None:
+            self._sharedCache.clear()
+
+    def getCacheSize(self):
+        """ Return the number of bytes used by the cached images. """
+        size = self._imageCache.getSize()
+        if self._coldCache is not None:
+            size += self._coldCache.getSize()
+        if self._sharedCache is not None:
+            size += self._sharedCache.getStats()['bytes']
+        return size
+
+    def _getHeader(self, imgSource):
+        """ Return the tuple ((x, y, z, n), dataType) for the file of the
+        given image source. Values are read from the file only the first time
+        or when the file has changed (modification time or size).
+        """
+        imgRef = self.getRef(imgSource)
+        st = self._stat(imgRef.path)
+        if st is None:
+            key = None  # Let emcore report the error when opening
+        else:
+            key = (imgRef.path, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            header = self._headerCache.get(key, None)
+            if header is not None:
+                self._headerCache.move_to_end(key)
+                return header
+
+        with self._openRO(imgRef) as (imgRef, imgIO):
+            dim = imgIO.getDim()
+            header = (dim.x, dim.y, dim.z, dim.n), imgIO.getType()
+
+        if key is not None:
+            with self._lock:
+                self._headerCache[key] = header
+                while len(self._headerCache) > HEADER_CACHE_SIZE:
+                    self._headerCache.popitem(last=False)
+
+        return header
 
     def getDim(self, imgSource):
         """ Shortcut method to return the dimensions of the given
         image source (x, y, z, n) """
-        imgRef, imgIO = self._openRO(imgSource)
-        dim = imgIO.getDim()
-        return dim.x, dim.y, dim.z, dim.n
+        return self._getHeader(imgSource)[0]
 
     def getInfo(self, imgSource):
         """
@@ -159,31 +1256,105 @@ class ImageManager:
         ext : File extension
         data_type: Image data type
         """
-        imgRef, imgIO = self._openRO(imgSource)
-        info = {
-            'dim': imgIO.getDim(),
+        imgRef = self.getRef(imgSource)
+        dim, dataType = self._getHeader(imgRef)
+        return {
+            'dim': emc.ArrayDim(*dim),
             'ext': EmPath.getExt(imgRef.path),
-            'data_type': imgIO.getType()
+            'data_type': dataType
         }
-        return info
+
+    def getDims(self, imgSources):
+        """ Return the list of dimensions (x, y, z, n) of the given image
+        sources. Files are opened only once even if they appear several
+        times (e.g. different indexes of the same stack).
+        """
+        return [self.getDim(s) for s in imgSources]
+
+    def getInfos(self, imgSources):
+        """ Return the list of info dicts (see getInfo) for the given
+        image sources.
+        """
+        return [self.getInfo(s) for s in imgSources]
+
+    def scanDir(self, dirPath):
+        """ Read the headers of all the EM data files in the given
+        directory (not recursively). Returns a dict with the info (see
+        getInfo) of each file path. Files that can not be read are skipped.
+        """
+        infos = OrderedDict()
+        for fn in sorted(os.listdir(dirPath)):
+            path = os.path.join(dirPath, fn)
+            if EmPath.isData(path) and os.path.isfile(path):
+                try:
+                    infos[path] = self.getInfo(path)
+                except Exception:
+                    pass
+        return infos
+
+
+class _PrefetchTask:
+    """ Image load requested through ImageManager.prefetch. """
+    def __init__(self, imgRef, priority, thumbnailSize=None):
+        self.imgRef = imgRef
+        self.priority = priority
+        self.thumbnailSize = thumbnailSize
+        self.future = Future()
+        self.started = False
+        # Number of prefetch calls that requested this task
+        self.requests = 0
+
+    def __lt__(self, other):
+        # Only needed to make tasks comparable in the heap
+        return id(self) < id(other)
+
+
+class _AccessPattern:
+    """ Recent accesses to the images of a file (see ImageManager._readAhead).
+    """
+    def __init__(self, index, time):
+        self.index = index
+        self.stride = 0
+        # Number of consecutive accesses with the same stride
+        self.count = 0
+        self.time = time
+        # Average time between accesses
+        self.interval = None
+        # Last index requested in background
+        self.ahead = index
+
+
+class _OpenFile:
+    """ Helper class to keep an open ImageFile in the ImageManager pool.
+    The lock serializes the access to the file from different threads,
+    and the file is only closed (after eviction) when there are no users.
+    """
+    def __init__(self, imgIO):
+        self.imgIO = imgIO
+        self.lock = threading.Lock()
+        self.users = 0
+        self.evicted = False
 
 
 class ImageRef:
     """
     The ImageRef class is used to describe the referenced image in a stack
     or volume. For performance reasons, the access to the member variables
-    is direct.
+    is direct and the attributes are declared in __slots__.
     """
+    __slots__ = ('path', 'index', 'slice', 'axis', 'imageType')
+
     SINGLE = 1
     STACK = 2
     VOLUME = 4
 
-    def __init__(self, path=None, index=0, slice=0):
+    def __init__(self, path=None, index=0, slice=0, axis=Z_AXIS):
         """
         Constructor:
         path (str): the image path
         index (int): the image index in the stack
-        volumeIndex (int): volume index in the volume stack
+        slice (int): the slice (starting at 1) of the volume along the axis,
+            0 means the whole volume
         axis (int): the axis
         axis = 0: X
         axis = 1: Y
@@ -193,6 +1364,7 @@ class ImageRef:
         self.path = path
         self.index = index
         self.slice = slice
+        self.axis = axis
         self.imageType = ImageRef.SINGLE
 
     @classmethod
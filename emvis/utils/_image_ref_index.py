@@ -0,0 +1,132 @@
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from ._image_manager import ImageRef
+
+
+class ImageRefIndex:
+    """
+    Compact index of the image references of a table column, with values
+    in the 'path', 'index@path' or 'slice@index@path' formats. Values are
+    parsed only once, paths are stored in a table and each row is described
+    by the integer id of its file (position in the paths table), image index
+    and slice, stored in numpy arrays.
+    """
+    def __init__(self, values, prefix=None):
+        """
+        Create a new ImageRefIndex.
+
+        Args:
+            values: Iterable with the string value of each row.
+            prefix: (str) Optional path prefix joined to all the paths
+                (see ImageManager.findImagePrefix).
+        """
+        paths = []
+        pathIds = dict()
+        fileIds, indexes, slices = [], [], []
+
+        for value in values:
+            path, index, slice = self.parseValue(value)
+            fileId = pathIds.get(path, None)
+            if fileId is None:
+                fileId = pathIds[path] = len(paths)
+                paths.append(path if prefix is None
+                             else os.path.join(prefix, path))
+            fileIds.append(fileId)
+            indexes.append(index)
+            slices.append(slice)
+
+        self._paths = paths
+        self._fileIds = np.array(fileIds, dtype=np.int32)
+        self._indexes = np.array(indexes, dtype=np.int64)
+        self._slices = np.array(slices, dtype=np.int32)
+
+    @classmethod
+    def parseValue(cls, value):
+        """ Return the (path, index, slice) referenced from a value in the
+        'path', 'index@path' or 'slice@index@path' formats. Index and slice
+        are 0 if not present.
+        """
+        parts = value.split('@')
+        n = len(parts)
+        if n == 1:
+            index, slice = 0, 0
+        elif n == 2:
+            index, slice = int(parts[0]), 0
+        elif n == 3:
+            index, slice = int(parts[1]), int(parts[0])
+        else:
+            raise Exception("Invalid number of @ in the image path: %s"
+                            % value)
+        return parts[-1], index, slice
+
+    def __len__(self):
+        return len(self._fileIds)
+
+    def getPaths(self):
+        """ Return the list of paths, the position of each path is its
+        file id.
+        """
+        return self._paths
+
+    def getFileIds(self):
+        """ Return the array with the file id of each row. """
+        return self._fileIds
+
+    def getIndexes(self):
+        """ Return the array with the image index of each row. """
+        return self._indexes
+
+    def getSlices(self):
+        """ Return the array with the slice of each row (0 if none). """
+        return self._slices
+
+    def getRef(self, row):
+        """ Return a new ImageRef for the given row. """
+        return ImageRef(self._paths[self._fileIds[row]],
+                        int(self._indexes[row]), int(self._slices[row]))
+
+    def getRefs(self, rows):
+        """ Return a list of new ImageRef for the given rows. """
+        rows = np.asarray(rows, dtype=np.int64)
+        paths = self._paths
+        return [ImageRef(paths[f], i, s) for f, i, s in
+                zip(self._fileIds[rows].tolist(),
+                    self._indexes[rows].tolist(),
+                    self._slices[rows].tolist())]
+
+    def groupByFile(self, rows=None, values=None):
+        """ Group the rows by the file they reference.
+
+        Args:
+            rows: Optional iterable with the rows to be grouped. If None,
+                all the rows will be grouped.
+            values: Optional array with a value for each one of the rows
+                (e.g. the position of the row in a sorted view), returned
+                in the groups instead of the rows.
+
+        Returns:
+            An OrderedDict with the path of each file (in file id order)
+            and the array of its rows (or values), sorted by image index.
+        """
+        if rows is None:
+            rows = np.arange(len(self._fileIds))
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+        values = rows if values is None else np.asarray(values)
+
+        fileIds = self._fileIds[rows]
+        order = np.lexsort((self._indexes[rows], fileIds))
+        values, fileIds = values[order], fileIds[order]
+        # Positions where a new file starts
+        starts = np.flatnonzero(np.diff(fileIds)) + 1
+
+        groups = OrderedDict()
+        for first, group in zip(np.concatenate(([0], starts)),
+                                np.split(values, starts)):
+            if len(group):
+                groups[self._paths[fileIds[first]]] = group
+        return groups
@@ -0,0 +1,84 @@
+
+import bisect
+import threading
+
+from ._empath import EmPath
+
+
+class IOStats:
+    """
+    Counters and read latency histograms collected by the ImageManager.
+    Histograms are lists with the number of reads that took less than each
+    of the LATENCY_BINS limits (in milliseconds), the last element counts
+    the reads over the last limit.
+    """
+    LATENCY_BINS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Set all counters and histograms to zero. """
+        with self._lock:
+            self._counters = dict()
+            self._latencyByFile = dict()
+            self._latencyByFormat = dict()
+
+    def count(self, name, n=1):
+        """ Increment the counter with the given name. """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @classmethod
+    def getFormat(cls, path):
+        """ Return the format of the path: either the one specified after
+        ':' or the file extension.
+        """
+        if ':' in path:
+            return path.split(':')[1]
+        return EmPath.getExt(path)
+
+    def addRead(self, path, seconds):
+        """ Register a read from the given path that took some seconds. """
+        b = bisect.bisect_left(self.LATENCY_BINS, seconds * 1000)
+        fmt = self.getFormat(path)
+
+        with self._lock:
+            self._counters['reads'] = self._counters.get('reads', 0) + 1
+            self._counters['read_time'] = (self._counters.get('read_time', 0)
+                                           + seconds)
+            for hists, key in [(self._latencyByFile, path),
+                               (self._latencyByFormat, fmt)]:
+                if key not in hists:
+                    hists[key] = [0] * (len(self.LATENCY_BINS) + 1)
+                hists[key][b] += 1
+
+    def snapshot(self):
+        """ Return a dict with a copy of the current values:
+        'counters': dict with the value of each counter
+        'latency_by_file': dict with the latency histogram of each file
+        'latency_by_format': dict with the latency histogram of each format
+        """
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'latency_by_file': {k: list(v) for k, v in
+                                    self._latencyByFile.items()},
+                'latency_by_format': {k: list(v) for k, v in
+                                      self._latencyByFormat.items()}
+            }
+
+    @classmethod
+    def diff(cls, before, after):
+        """ Return the difference between two snapshots (after - before).
+        Snapshots are nested dicts with numbers or lists of numbers, as the
+        ones returned by ImageManager.getStats.
+        """
+        if isinstance(after, dict):
+            return {k: cls.diff(before.get(k, None), v)
+                    for k, v in after.items()}
+        if isinstance(after, list):
+            before = before or [0] * len(after)
+            return [a - b for a, b in zip(after, before)]
+        return after - (before or 0)
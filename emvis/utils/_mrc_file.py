@@ -0,0 +1,107 @@
+
+import os
+import numpy as np
+
+from ._empath import EmPath
+
+
+class MrcFile:
+    """
+    Read-only access to the data of MRC files through a numpy memmap.
+    Images are returned as views into the mapped file, so no data is copied
+    and the caching is left to the operating system page cache.
+    """
+    HEADER_SIZE = 1024
+    EXTENSIONS = ['.mrc', '.mrcs', '.map']
+
+    # Only modes without ambiguity in their interpretation are supported.
+    # Mode 0 is signed or unsigned depending on the program that wrote it,
+    # so those files should be read through emcore.
+    MODE_TO_DTYPE = {
+        1: np.int16,
+        2: np.float32,
+        6: np.uint16,
+        12: np.float16
+    }
+
+    def __init__(self, path, dim=None):
+        """
+        Map the given MRC file.
+
+        Args:
+            path: (str) The path of the MRC file.
+            dim: (tuple) Optional (x, y, z, n) dimensions of the file. If
+                not provided, they are inferred from the header: '.mrcs' files
+                and space group 0 are stacks of images, space groups from 401
+                are stacks of volumes and other values are single volumes.
+        """
+        self._path = path
+        with open(path, 'rb') as f:
+            header = f.read(self.HEADER_SIZE)
+
+        if len(header) < self.HEADER_SIZE:
+            raise Exception("Invalid MRC file: %s" % path)
+
+        # Machine stamp, 0x44 for little endian and 0x11 for big endian
+        byteOrder = '>' if header[212] == 0x11 else '<'
+        words = np.frombuffer(header, dtype=byteOrder + 'i4', count=25)
+        nx, ny, nz, mode = [int(v) for v in words[:4]]
+        mz, ispg, nsymbt = int(words[9]), int(words[22]), int(words[23])
+
+        if mode not in self.MODE_TO_DTYPE:
+            raise Exception("Unsupported MRC mode %d for file: %s"
+                            % (mode, path))
+
+        if dim is not None:
+            x, y, z, n = dim
+            if (x, y) != (nx, ny) or z * n != nz:
+                raise Exception("Dimensions %s do not match MRC header in "
+                                "file: %s" % (dim, path))
+        elif EmPath.getExt(path) == '.mrcs' or ispg == 0:
+            x, y, z, n = nx, ny, 1, nz
+        elif ispg >= 401 and mz > 0 and nz % mz == 0:
+            x, y, z, n = nx, ny, mz, nz // mz
+        else:
+            x, y, z, n = nx, ny, nz, 1
+
+        dtype = np.dtype(self.MODE_TO_DTYPE[mode]).newbyteorder(byteOrder)
+        offset = self.HEADER_SIZE + nsymbt
+        if os.path.getsize(path) < offset + x * y * z * n * dtype.itemsize:
+            raise Exception("MRC file is smaller than expected: %s" % path)
+
+        self._dim = x, y, z, n
+        self._data = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                               shape=(n, z, y, x))
+
+    @classmethod
+    def isMrc(cls, path):
+        """ Return True if the path has one of the MRC extensions. """
+        return EmPath.getExt(path) in cls.EXTENSIONS
+
+    def getPath(self):
+        return self._path
+
+    def getDim(self):
+        """ Return the dimensions of the file (x, y, z, n). """
+        return self._dim
+
+    def getDtype(self):
+        """ Return the numpy dtype of the data in the file. """
+        return self._data.dtype
+
+    def getArray(self):
+        """ Return the whole mapped array with shape (n, z, y, x). """
+        return self._data
+
+    def getData(self, index):
+        """ Return a read-only view of the image at the given index
+        (starting at 1, 0 is also the first image). The shape of the view
+        is (y, x) for 2D images and (z, y, x) for volumes.
+        """
+        n = self._dim[3]
+        i = max(index, 1) - 1
+        if i >= n:
+            raise Exception("Index should be between 1 and %d, value is %d"
+                            % (n, index))
+        data = self._data[i]
+        return data[0] if self._dim[2] == 1 else data
@@ -0,0 +1,159 @@
+
+import ast
+import operator
+
+import numpy as np
+
+
+class RowFilter:
+    """
+    Boolean expression over the columns of a table, such as
+    'rlnClassNumber == 3 and rlnLogLikeliContribution > 1e5', that is
+    evaluated with numpy on whole columns. The expression is parsed with
+    the Python syntax but only names (columns), constants, arithmetic,
+    comparisons and the and/or/not operators are allowed.
+    """
+    BIN_OPS = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.Mod: operator.mod
+    }
+
+    UNARY_OPS = {
+        ast.USub: operator.neg,
+        ast.UAdd: operator.pos,
+        ast.Not: np.logical_not
+    }
+
+    COMPARE_OPS = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge
+    }
+
+    def __init__(self, expression):
+        """
+        Parse the given expression.
+
+        Args:
+            expression: (str) The filter expression. Names are the names of
+                the table columns.
+        """
+        self._expression = expression
+        try:
+            self._tree = ast.parse(expression.strip(), mode='eval').body
+        except SyntaxError as e:
+            raise Exception("Invalid filter expression '%s': %s"
+                            % (expression, e))
+        self._names = []
+        self._check(self._tree)
+
+    def _check(self, node):
+        """ Check that only the allowed nodes are used and store the names
+        of the columns.
+        """
+        if isinstance(node, ast.Name):
+            if node.id not in self._names:
+                self._names.append(node.id)
+        elif isinstance(node, ast.Constant):
+            pass
+        elif isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.BinOp) and type(node.op) in self.BIN_OPS:
+            self._check(node.left)
+            self._check(node.right)
+        elif (isinstance(node, ast.UnaryOp)
+              and type(node.op) in self.UNARY_OPS):
+            self._check(node.operand)
+        elif (isinstance(node, ast.Compare)
+              and all(type(op) in self.COMPARE_OPS for op in node.ops)):
+            for child in [node.left] + node.comparators:
+                self._check(child)
+        else:
+            raise Exception("Invalid element '%s' in filter expression: %s"
+                            % (type(node).__name__, self._expression))
+
+    def getExpression(self):
+        return self._expression
+
+    def getNames(self):
+        """ Return the names of the columns used in the expression. """
+        return list(self._names)
+
+    def evaluate(self, getColumn):
+        """ Evaluate the expression.
+
+        Args:
+            getColumn: Function called as getColumn(name) for each column
+                of the expression. It should return a numpy array with the
+                values of the column, or the (categories, codes) arrays of
+                string columns (see EmTableModel.getColumnCategories).
+
+        Returns:
+            The numpy array of booleans with the result for each row.
+        """
+        columns = dict()
+
+        def _getColumn(name):
+            if name not in columns:
+                columns[name] = getColumn(name)
+            return columns[name]
+
+        return np.asarray(self._eval(self._tree, _getColumn), dtype=bool)
+
+    def _eval(self, node, getColumn):
+        if isinstance(node, ast.Name):
+            return self._toArray(getColumn(node.id))
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BoolOp):
+            func = (np.logical_and if isinstance(node.op, ast.And)
+                    else np.logical_or)
+            result = self._eval(node.values[0], getColumn)
+            for value in node.values[1:]:
+                result = func(result, self._eval(value, getColumn))
+            return result
+        if isinstance(node, ast.BinOp):
+            return self.BIN_OPS[type(node.op)](
+                self._eval(node.left, getColumn),
+                self._eval(node.right, getColumn))
+        if isinstance(node, ast.UnaryOp):
+            return self.UNARY_OPS[type(node.op)](
+                self._eval(node.operand, getColumn))
+
+        # Compare, chains like 'a < b < c' are evaluated as 'a < b and b < c'
+        result = True
+        left = node.left
+        for op, right in zip(node.ops, node.comparators):
+            value = self._compare(op, left, right, getColumn)
+            result = value if result is True else np.logical_and(result,
+                                                                 value)
+            left = right
+        return result
+
+    def _compare(self, op, left, right, getColumn):
+        func = self.COMPARE_OPS[type(op)]
+        # Equality between a string column and a constant is evaluated on
+        # the categories, without building the whole column
+        if isinstance(op, (ast.Eq, ast.NotEq)):
+            if isinstance(left, ast.Constant):
+                left, right = right, left
+            if isinstance(left, ast.Name) and isinstance(right, ast.Constant):
+                column = getColumn(left.id)
+                if isinstance(column, tuple):
+                    categories, codes = column
+                    return func(categories, right.value).astype(bool)[codes]
+        return func(self._eval(left, getColumn), self._eval(right, getColumn))
+
+    @classmethod
+    def _toArray(cls, column):
+        if isinstance(column, tuple):
+            categories, codes = column
+            return categories[codes]
+        return column
@@ -0,0 +1,289 @@
+
+import hashlib
+import os
+import struct
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+class SharedImageCache:
+    """
+    Cache of numpy arrays stored in multiprocessing.shared_memory segments,
+    so several processes (e.g. viewers of the same dataset) can attach to
+    the images decoded by any of them instead of reading them again.
+
+    The name of each segment is derived from its key, so keys should
+    identify the data across processes (e.g. absolute path, modification
+    time, size and index of the image). Each process keeps a local index
+    of the segments it uses, bounded by maxSize. Segments created by this
+    process are unlinked when evicted, processes already attached to them
+    keep their mapping.
+
+    The header of each segment stores the PID of the process that wrote it
+    and a random token. A segment that is not ready is only replaced if its
+    writer is not running anymore, and segments are only unlinked if they
+    still have the token written by this process.
+    """
+    PREFIX = 'emvis_'
+    # Header: magic, ready flag, dtype, ndim, shape (up to 4 dimensions),
+    # writer PID and token
+    HEADER_FORMAT = '<4sB16sB4qI8s'
+    HEADER_SIZE = 128
+    MAGIC = b'EMVS'
+
+    def __init__(self, maxSize):
+        """
+        Create a new SharedImageCache.
+
+        Args:
+            maxSize: (int) Maximum number of bytes of the segments used by
+                this process.
+        """
+        if shared_memory is None:
+            raise Exception("Shared memory cache requires Python >= 3.8")
+
+        self._maxSize = maxSize
+        self._size = 0
+        # Map between keys and (SharedMemory, array, token) tuples, token
+        # is None for the segments created by other processes
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._attaches = 0
+        self._misses = 0
+
+    @classmethod
+    def _getName(cls, key):
+        """ Return the name of the shared memory segment for the key. """
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return cls.PREFIX + digest[:20]
+
+    @classmethod
+    def _attach(cls, name):
+        """ Attach to an existing segment without registering it in the
+        resource tracker, that would remove it when this process exits.
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 has no track argument
+            shm = shared_memory.SharedMemory(name=name)
+            cls._untrack(shm)
+            return shm
+
+    @classmethod
+    def _untrack(cls, shm):
+        """ Unregister the segment from the resource tracker, so it is not
+        removed when this process exits.
+        """
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    @classmethod
+    def _readHeader(cls, buf):
+        """ Return the header of the segment as a dict, or None if the
+        header has not been written yet.
+        """
+        if len(buf) < cls.HEADER_SIZE:
+            return None
+        header = struct.unpack_from(cls.HEADER_FORMAT, buf)
+        if header[0] != cls.MAGIC:
+            return None
+        return {
+            'ready': bool(header[1]),
+            'dtype': header[2].rstrip(b'\0').decode(),
+            'shape': header[4:4 + header[3]],
+            'pid': header[8],
+            'token': header[9]
+        }
+
+    @classmethod
+    def _isRunning(cls, pid):
+        """ Return True if a process with the given PID exists. """
+        if os.name == 'nt':
+            # Segments are removed by Windows when no process uses them
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass  # e.g. the process belongs to other user
+        return True
+
+    @classmethod
+    def _getArray(cls, shm, dtype, shape):
+        """ Return the array stored after the header of the segment.
+        The segment is closed (unmapped) when the array, and any view of
+        it, is not used anymore.
+        """
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf,
+                           offset=cls.HEADER_SIZE)
+        weakref.finalize(array, shm.close)
+        return array
+
+    def get(self, key):
+        """ Return the (read-only) array stored for the key, either from
+        the local index or attaching to a segment created by other process.
+        Return None if the image is not in shared memory.
+        """
+        with self._lock:
+            item = self._items.get(key, None)
+            if item is not None:
+                self._hits += 1
+                self._items.move_to_end(key)
+                return item[1]
+
+        try:
+            shm = self._attach(self._getName(key))
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._misses += 1
+            return None
+
+        header = self._readHeader(shm.buf)
+        if header is None or not header['ready']:  # Still being written
+            shm.close()
+            with self._lock:
+                self._misses += 1
+            return None
+
+        array = self._getArray(shm, header['dtype'], header['shape'])
+        array.flags.writeable = False
+        with self._lock:
+            self._attaches += 1
+            self._add(key, shm, array, None)
+        return array
+
+    def put(self, key, data):
+        """ Copy the data to a new shared memory segment for the key.
+        Return the (read-only) shared array, that can be used instead of
+        the input data, or the input data if other process is still writing
+        the segment.
+        """
+        name = self._getName(key)
+        size = max(self.HEADER_SIZE + data.nbytes, 1)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True,
+                                             size=size)
+        except FileExistsError:  # Other process stored it meanwhile
+            array = self.get(key)
+            if array is not None:
+                return array
+            # The segment is not ready. It is only replaced if it was left
+            # by a process that crashed while writing it.
+            if not self._unlink(name, self._isStale):
+                return data
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True,
+                                                 size=size)
+            except FileExistsError:
+                return data
+
+        dtype = data.dtype.newbyteorder('=').str.encode()
+        shape = list(data.shape) + [0] * (4 - data.ndim)
+        token = os.urandom(8)
+        struct.pack_into(self.HEADER_FORMAT, shm.buf, 0, self.MAGIC, 0,
+                         dtype, data.ndim, *(shape + [os.getpid(), token]))
+        array = self._getArray(shm, dtype.decode(), data.shape)
+        np.copyto(array, data)
+        # Mark the segment as ready to be used by other processes
+        struct.pack_into('<B', shm.buf, 4, 1)
+        array.flags.writeable = False
+
+        with self._lock:
+            self._add(key, shm, array, token)
+        return array
+
+    @classmethod
+    def _isStale(cls, header):
+        """ Return True if the segment with the given header was left not
+        ready by a process that is not running anymore. Segments whose
+        header has not been written yet are not considered stale, since
+        their writer can not be known.
+        """
+        return (header is not None and not header['ready']
+                and not cls._isRunning(header['pid']))
+
+    @classmethod
+    def _unlink(cls, name, condition):
+        """ Remove the segment with the given name if it exists and
+        condition(header) returns True (see _readHeader).
+        Return True if the segment has been removed or does not exist.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except (FileNotFoundError, ValueError):
+            return True
+        try:
+            if not condition(cls._readHeader(shm.buf)):
+                # Not ours, also forget the segment if it was created here
+                cls._untrack(shm)
+                return False
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        finally:
+            shm.close()
+        return True
+
+    def _add(self, key, shm, array, token):
+        """ Add the segment to the local index, evicting old ones.
+        Should be called with the lock acquired.
+        """
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._release(old)
+        self._items[key] = (shm, array, token)
+        self._size += shm.size
+
+        while self._size > self._maxSize and len(self._items) > 1:
+            _, item = self._items.popitem(last=False)
+            self._release(item)
+
+    def _release(self, item):
+        """ Remove the segment of the item from the local index, and unlink
+        it if it was created here and it has not been replaced by other
+        process. The segment is closed when its array is not used anymore
+        (see _getArray).
+        """
+        shm, _, token = item
+        self._size -= shm.size
+        if token is not None:
+            self._unlink(shm.name, lambda h: h is not None
+                         and h['token'] == token)
+
+    def getStats(self):
+        """ Return a dict with the cache counters and current usage. """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'attaches': self._attaches,
+                'misses': self._misses,
+                'items': len(self._items),
+                'bytes': self._size,
+                'max_bytes': self._maxSize
+            }
+
+    def resetStats(self):
+        """ Set the hits, attaches and misses counters to zero. """
+        with self._lock:
+            self._hits = 0
+            self._attaches = 0
+            self._misses = 0
+
+    def clear(self):
+        """ Release all the segments used by this process. """
+        with self._lock:
+            while self._items:
+                _, item = self._items.popitem(last=False)
+                self._release(item)
@@ -0,0 +1,398 @@
+
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of rows parsed together by StarTable
+PAGE_SIZE = 1000
+
+# Maximum number of parsed pages kept by each StarTable
+MAX_PAGES = 100
+
+# Bytes of the file processed in each step of the rows scan
+SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Tokens of a data line: quoted strings or sequences of non-blank characters
+TOKEN_RE = re.compile(br'"[^"]*"|\'[^\']*\'|\S+')
+
+_WHITESPACE = np.array([9, 10, 13, 32], dtype=np.uint8)
+
+
+class StarFile:
+    """
+    Read-only access to the tables (data blocks) of a STAR file without
+    loading them in memory. The file is mapped and only the position of
+    the blocks is found when it is opened. See StarTable for the access to
+    the rows of each table.
+    """
+    def __init__(self, path):
+        """
+        Open the given STAR file.
+
+        Args:
+            path: (str) The path of the STAR file.
+        """
+        self._path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._mm = b''
+        # Map between table names and (start, end) offsets of the blocks
+        self._blocks = self._findBlocks()
+        self._tables = dict()
+
+    def _findBlocks(self):
+        """ Return an OrderedDict with the name of each data block and the
+        offsets of its content.
+        """
+        mm = self._mm
+        starts = [0] if mm[:5] == b'data_' else []
+        pos = mm.find(b'\ndata_')
+        while pos >= 0:
+            starts.append(pos + 1)
+            pos = mm.find(b'\ndata_', pos + 1)
+
+        blocks = OrderedDict()
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else len(mm)
+            lineEnd = mm.find(b'\n', start, end)
+            lineEnd = end if lineEnd < 0 else lineEnd + 1
+            name = mm[start + 5:lineEnd].decode('utf-8').strip()
+            blocks[name] = (lineEnd, end)
+        return blocks
+
+    def getPath(self):
+        return self._path
+
+    def getTableNames(self):
+        """ Return the names of the tables (without the 'data_' prefix). """
+        return list(self._blocks.keys())
+
+    def getTable(self, tableName):
+        """ Return the StarTable with the given name. The scan of its rows
+        is started the first time it is requested.
+        """
+        table = self._tables.get(tableName, None)
+        if table is None:
+            if tableName not in self._blocks:
+                raise Exception("Missing table '%s' in file: %s"
+                                % (tableName, self._path))
+            start, end = self._blocks[tableName]
+            table = StarTable(self._mm, tableName, start, end)
+            self._tables[tableName] = table
+        return table
+
+    def close(self):
+        """ Stop the scans and close the mapped file. """
+        for table in self._tables.values():
+            table.stop()
+        self._tables.clear()
+        if isinstance(self._mm, mmap.mmap):
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # Arrays still in use, it will be closed when released
+
+
+class StarTable:
+    """
+    Rows of a table (data block) of a mapped STAR file. The header is read
+    when the table is created, while the offsets of the rows are computed in
+    a background thread, so the number of rows grows until the scan is
+    finished (see isLoaded and waitLoaded). Rows are parsed on demand, in
+    pages of PAGE_SIZE rows, and the type of each column (int, float or
+    str) is inferred from the first page.
+    Tables without loop_ have a single row with the values of the header.
+    """
+    def __init__(self, mm, name, start, end):
+        self._mm = mm
+        self._name = name
+        self._end = end
+        self._columns = []
+        self._types = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._scanned = threading.Condition(self._lock)
+        self._offsets = np.empty(0, dtype=np.int64)
+        self._rowsCount = 0
+        self._loaded = False
+        self._stopped = False
+        self._rowsCallback = None
+        # Serialize the notifications, so the counts are increasing
+        self._callbackLock = threading.RLock()
+        self._values = None
+
+        self._dataStart = self._readHeader(start)
+        if self._values is not None:  # Single row table
+            self._rowsCount = 1
+            self._loaded = True
+        else:
+            self._thread = threading.Thread(target=self._scan,
+                                            name='StarTable-%s' % name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _readHeader(self, start):
+        """ Read the columns (and values of tables without loop) from the
+        header. Return the offset of the first data line.
+        """
+        mm, pos, end = self._mm, start, self._end
+        isLoop = False
+        values = []
+
+        while pos < end:
+            lineEnd = mm.find(b'\n', pos, end)
+            lineEnd = end if lineEnd < 0 else lineEnd + 1
+            line = mm[pos:lineEnd].strip()
+            if not line or line.startswith(b'#'):
+                pass
+            elif line.startswith(b'loop_'):
+                isLoop = True
+            elif line.startswith(b'_'):
+                parts = line.split(None, 1)
+                self._columns.append(parts[0][1:].decode('utf-8'))
+                if not isLoop:
+                    value = parts[1] if len(parts) > 1 else b''
+                    values.append(self._unquote(value.strip()))
+            else:
+                break  # First data line
+            pos = lineEnd
+
+        if not isLoop:
+            self._values = [np.array([v]) for v in values]
+            self._types = [self._inferType(v) for v in self._values]
+            self._values = [self._convert(v, t)
+                            for v, t in zip(self._values, self._types)]
+        return pos
+
+    @classmethod
+    def _unquote(cls, token):
+        if len(token) > 1 and token[:1] in b'"\'' and token[-1:] == token[:1]:
+            return token[1:-1]
+        return token
+
+    def _scan(self):
+        """ Compute the offsets of the data lines (not empty nor comments).
+        This function is executed in a background thread.
+        """
+        pos, end = self._dataStart, self._end
+        chunkSize = SCAN_CHUNK_SIZE
+
+        while pos < end and not self._stopped:
+            chunkEnd = min(pos + chunkSize, end)
+            buf = np.frombuffer(self._mm, dtype=np.uint8,
+                                count=chunkEnd - pos, offset=pos)
+            newLines = np.flatnonzero(buf == 10)
+            if chunkEnd < end:
+                if len(newLines) == 0:  # Line longer than the chunk
+                    chunkSize *= 2
+                    continue
+                # Only process complete lines
+                buf = buf[:newLines[-1] + 1]
+                newLines = newLines[:-1]
+
+            starts = np.concatenate(([0], newLines + 1))
+            starts = starts[starts < len(buf)]
+            # Lines with some non-blank character that are not comments
+            notBlank = ~np.isin(buf, _WHITESPACE)
+            valid = (np.maximum.reduceat(notBlank, starts)
+                     & (buf[starts] != ord('#')))
+            offsets = starts[valid].astype(np.int64) + pos
+
+            with self._lock:
+                self._offsets = np.concatenate((self._offsets, offsets))
+                self._rowsCount = len(self._offsets)
+                self._scanned.notify_all()
+            if len(offsets):
+                self._notifyRows()
+            pos += len(buf)
+
+        with self._lock:
+            self._loaded = True
+            self._scanned.notify_all()
+        self._notifyRows()
+
+    def _notifyRows(self):
+        """ Call the rows callback with the number of rows found. """
+        with self._callbackLock:
+            if self._rowsCallback is not None and self._rowsCount:
+                self._rowsCallback(self._rowsCount)
+
+    def stop(self):
+        """ Stop the scan of the rows (if it is still running). """
+        self._stopped = True
+
+    def setRowsCallback(self, callback):
+        """ Set the function called as callback(rowsCount) from the scan
+        thread when new rows are found and when the scan finishes. If some
+        rows have already been found, it is also called now with their
+        number.
+        """
+        with self._callbackLock:
+            self._rowsCallback = callback
+            self._notifyRows()
+
+    def getName(self):
+        return self._name
+
+    def getRowsCount(self):
+        """ Return the number of rows found until now. """
+        return self._rowsCount
+
+    def isLoaded(self):
+        """ Return True if the scan of the rows has finished. """
+        return self._loaded
+
+    def waitLoaded(self, timeout=None):
+        """ Wait until the scan of the rows has finished.
+        Return True if it finished before the timeout (seconds).
+        """
+        with self._lock:
+            return self._scanned.wait_for(lambda: self._loaded, timeout)
+
+    def _waitRows(self, n):
+        """ Wait until n rows have been found (or the scan is finished). """
+        with self._lock:
+            self._scanned.wait_for(
+                lambda: self._rowsCount >= n or self._loaded)
+
+    def getColumnNames(self):
+        return list(self._columns)
+
+    def getColumnTypes(self):
+        """ Return the type (int, float or str) of each column. """
+        if self._types is None:
+            self._getPage(0)
+        return list(self._types)
+
+    @classmethod
+    def _inferType(cls, values):
+        """ Return the first of int, float or str that can represent all
+        the values (a numpy array of strings).
+        """
+        for t in [np.int64, np.float64]:
+            try:
+                values.astype(t)
+                return int if t is np.int64 else float
+            except (ValueError, OverflowError):
+                pass
+        return str
+
+    @classmethod
+    def _convert(cls, values, t):
+        """ Convert the array of bytes to the given type. Values of str
+        columns, or that can not be converted, are kept as bytes.
+        """
+        if t is str:
+            return values
+        for dtype in [np.int64 if t is int else np.float64, np.float64]:
+            try:
+                return values.astype(dtype)
+            except (ValueError, OverflowError):
+                pass
+        return values
+
+    def _parseRows(self, first, last, cols=None):
+        """ Parse the rows in [first, last) and return the list of arrays
+        with the values of the given columns (all if None).
+        """
+        self._waitRows(last)
+        with self._lock:
+            last = min(last, self._rowsCount)
+            if first < last:
+                start = self._offsets[first]
+                end = (self._offsets[last] if last < self._rowsCount
+                       else self._end)
+
+        n, m = max(last - first, 0), len(self._columns)
+        if n == 0:
+            lines = []
+        else:
+            lines = [line for line in self._mm[start:end].split(b'\n')
+                     if line.strip() and line[:1] != b'#']
+        data = b' '.join(lines)
+        tokens = data.split()
+        if (len(tokens) == n * m and b'"' not in data
+                and b"'" not in data):
+            values = np.array(tokens, dtype=bytes).reshape(n, m)
+        else:  # Quoted strings or missing values
+            values = np.empty((n, m), dtype=object)
+            for i, line in enumerate(lines):
+                row = [self._unquote(t) for t in TOKEN_RE.findall(line)]
+                row = (row + [b''] * m)[:m]
+                values[i] = row
+            values = values.astype(bytes)
+
+        if self._types is None:
+            self._types = [self._inferType(values[:, j]) for j in range(m)]
+        cols = range(m) if cols is None else cols
+        return [self._convert(values[:, j], self._types[j]) for j in cols]
+
+    def _getPage(self, p):
+        """ Return the list of column arrays of the page p. """
+        with self._lock:
+            page = self._pages.get(p, None)
+            if page is not None:
+                self._pages.move_to_end(p)
+                return page
+
+        page = self._parseRows(p * PAGE_SIZE, (p + 1) * PAGE_SIZE)
+        with self._lock:
+            self._pages[p] = page
+            while len(self._pages) > MAX_PAGES:
+                self._pages.popitem(last=False)
+        return page
+
+    def getValue(self, row, col):
+        """ Return the value (int, float or str) of the given row and
+        column.
+        """
+        if self._values is not None:
+            column = self._values[col]
+        else:
+            if not 0 <= row < self._rowsCount:
+                self._waitRows(row + 1)
+            if not 0 <= row < self._rowsCount:
+                raise Exception("Invalid row %d, table has %d rows"
+                                % (row, self._rowsCount))
+            column = self._getPage(row // PAGE_SIZE)[col]
+            row %= PAGE_SIZE
+        value = column[row].item()
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def getColumn(self, col):
+        """ Return a numpy array with all the values of the column
+        (waiting for the scan to finish). Values of str columns are
+        returned as bytes (dtype 'S'), that use less memory than str arrays
+        (see numpy.char.decode). The rows are parsed in blocks of pages but
+        only the values of this column are kept. The array is not cached,
+        so each call parses the rows again.
+        """
+        if self._values is not None:
+            return self._values[col]
+
+        self.waitLoaded()
+        if not self._rowsCount:
+            return np.empty(0, dtype=bytes)
+
+        step = PAGE_SIZE * 10
+        parts = []
+        for first in range(0, self._rowsCount, step):
+            values = self._parseRows(first, first + step, [col])[0]
+            if values.dtype.kind == 'S':
+                # Rows are split with the width of the longest value of
+                # any column
+                width = max(int(np.char.str_len(values).max()), 1)
+                values = values.astype('S%d' % width)
+            parts.append(values)
+
+        kinds = set(p.dtype.kind for p in parts)
+        if len(kinds) > 1:  # Some values could not be converted
+            dtype = np.float64 if kinds <= {'i', 'f'} else bytes
+            parts = [p.astype(dtype) for p in parts]
+        return np.concatenate(parts)
@@ -23,9 +23,12 @@ class EmBrowser(dv.widgets.FileBrowser):
         Creates a EmBrowser instance
         Keyword Args:
             textLines: The first and last lines to be shown in text file preview
+            maxPreviewSize: If provided, images bigger than this size will
+                be binned (by powers of 2) to be shown in the preview
             :class:`FileBrowser <dv.widgets.FileBrowser>` params
         """
         self._lines = kwargs.get('textLines', 100)
+        self._maxPreviewSize = kwargs.get('maxPreviewSize')
         dv.widgets.FileBrowser.__init__(self, **kwargs)
         self._registerViews()
         self._dataView.sigCurrentTableChanged.connect(
@@ -152,11 +155,15 @@ class EmBrowser(dv.widgets.FileBrowser):
         Returns:
             A dict with file info
         """
-        info = ImageManager().getInfo(path)
+        info = ImageManager.getDefault().getInfo(path)
         d = info['dim']
         if d.n == 1:  # Single image or volume
             if d.z == 1:  # Single image
-                model = ModelsFactory.createImageModel(path)
+                binning = 1
+                if self._maxPreviewSize:
+                    while max(d.x, d.y) // binning > self._maxPreviewSize:
+                        binning *= 2
+                model = ModelsFactory.createImageModel(path, binning=binning)
                 self._imageView.setModel(model)
                 self._imageView.setImageInfo(
                     path=path, format=info['ext'],
@@ -10,12 +10,15 @@ from ._box import ImageBox
 class ViewsFactory:
     """ Factory class to centralize the creation of Views, using the
     underlying classes from em-core.
+    An imageManager keyword argument can be provided to the methods that
+    read images, otherwise the default ImageManager is used.
     """
 
     @staticmethod
     def createImageView(path, **kwargs):
         """ Create an ImageView and load the image from the given path """
-        imgModel = ModelsFactory.createImageModel(path)
+        imgModel = ModelsFactory.createImageModel(
+            path, imageManager=kwargs.pop('imageManager', None))
         imgView = dv.views.ImageView(model=imgModel, **kwargs)
         return imgView
 
@@ -32,19 +35,22 @@ class ViewsFactory:
     @staticmethod
     def createSlicesView(path, **kwargs):
         """ Create an SlicesView and load the slices from the given path """
-        model = ModelsFactory.createStackModel(path)
+        model = ModelsFactory.createStackModel(
+            path, imageManager=kwargs.pop('imageManager', None))
         return dv.views.SlicesView(model, **kwargs)
 
     @staticmethod
     def createVolumeView(path, **kwargs):
         """ Create an VolumeView and load the volume from the given path """
-        model = ModelsFactory.createVolumeModel(path)
+        model = ModelsFactory.createVolumeModel(
+            path, imageManager=kwargs.pop('imageManager', None))
         return dv.views.VolumeView(model, **kwargs)
 
     @staticmethod
     def createDataView(path, visible=[], render=[], **kwargs):
         """ Create an DataView and load the volume from the given path """
-        model = ModelsFactory.createTableModel(path)
+        model = ModelsFactory.createTableModel(
+            path, imageManager=kwargs.pop('imageManager', None))
         if visible or render:
             cConfig = model.createDefaultConfig()
             gConfig = model.createDefaultConfig()